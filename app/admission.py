@@ -0,0 +1,223 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, Optional
+
+from .config import Config
+
+
+class Overloaded(Exception):
+    """Work refused up front; the caller should serve its fallback"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """Non-blocking semaphore: a full limiter refuses instead of queueing"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class TokenBucketLimiter:
+    """
+    One token bucket per key (e.g. user): `rate` tokens per second up to
+    `burst`. Buckets idle long enough to be full are indistinguishable from
+    new ones, so only the max_keys most recent are kept.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_take(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and refuses calls
+    for `reset_after` seconds; then lets a single trial call through, which
+    closes it again on success or re-opens it on failure
+    """
+
+    def __init__(self, failure_threshold: int, reset_after: float):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        return 'half-open' if self._probing else 'open'
+
+    def is_open(self) -> bool:
+        """Whether calls are being refused right now (without claiming the trial call)"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return self._probing or time.monotonic() - self._opened_at < self.reset_after
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_after:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self._opened_at is None and self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._probing = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.opened,
+                "rejected": self.rejected
+            }
+
+
+class AdmissionController:
+    """
+    Admission for expensive routes: each route has its own concurrency
+    limit and all of them share one token bucket per user and, optionally,
+    the circuit breaker of the service behind them. Refused requests raise
+    Overloaded at once, so no worker thread sits waiting.
+    """
+
+    def __init__(self, limits: Dict[str, int], user_rate: float, user_burst: float,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.breaker = breaker
+        self._routes = {route: ConcurrencyLimiter(limit) for route, limit in limits.items()}
+        self._users = TokenBucketLimiter(user_rate, user_burst)
+        self._counts = {route: {"admitted": 0, "shed": 0} for route in limits}
+        self._shed_reasons: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, route: str, outcome: str, reason: Optional[str] = None) -> None:
+        with self._lock:
+            self._counts[route][outcome] += 1
+            if reason is not None:
+                self._shed_reasons[reason] = self._shed_reasons.get(reason, 0) + 1
+
+    def shed(self, route: str, reason: str) -> None:
+        self._count(route, "shed", reason)
+
+    def _refusal(self, route: str, user_key: Hashable) -> Optional[str]:
+        if self.breaker is not None and self.breaker.is_open():
+            reason = "circuit_open"
+        elif user_key is not None and not self._users.try_take(user_key):
+            reason = "user_rate"
+        elif not self._routes[route].try_acquire():
+            reason = "concurrency"
+        else:
+            self._count(route, "admitted")
+            return None
+        self.shed(route, reason)
+        return reason
+
+    def try_acquire(self, route: str, user_key: Hashable = None) -> bool:
+        """
+        Claim a slot on the route (release() it when done), or count a shed
+        and return False. A user_key of None skips the per-user bucket, for
+        background work.
+        """
+        return self._refusal(route, user_key) is None
+
+    def release(self, route: str) -> None:
+        self._routes[route].release()
+
+    @contextmanager
+    def admit(self, route: str, user_key: Hashable) -> Iterator[None]:
+        reason = self._refusal(route, user_key)
+        if reason is not None:
+            raise Overloaded(reason)
+        try:
+            yield
+        finally:
+            self.release(route)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "routes": {
+                    route: {
+                        "limit": limiter.limit,
+                        "in_flight": limiter.in_flight,
+                        **self._counts[route]
+                    }
+                    for route, limiter in self._routes.items()
+                },
+                "user_rate": {"per_second": self._users.rate, "burst": self._users.burst},
+                "shed_reasons": dict(self._shed_reasons),
+                "circuit": self.breaker.stats() if self.breaker is not None else None
+            }
+
+
+# Fails LLM calls fast while OpenAI is down or timing out
+llm_breaker = CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET)
+
+llm_admission = AdmissionController(
+    {
+        "insights": Config.INSIGHTS_CONCURRENCY,
+        "budget": Config.BUDGET_CONCURRENCY,
+        "classify": Config.CLASSIFY_CONCURRENCY,
+    },
+    user_rate=Config.LLM_USER_RATE,
+    user_burst=Config.LLM_USER_BURST,
+    breaker=llm_breaker
+)
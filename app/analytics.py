@@ -0,0 +1,154 @@
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Integer, String, text
+from sqlalchemy.orm import Session
+
+from .utils import from_cents
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter')
+
+# How SQLAlchemy stores DateTime in SQLite; bound values must compare as text
+_STORED_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Longest series one request may ask for, whatever the granularity
+MAX_BUCKETS = 10000
+
+# Start of the bucket containing local time `lt`; weeks start on Monday
+_BUCKET_SQL = {
+    'day': "date({lt})",
+    'week': "date({lt}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {lt})",
+    'quarter': "printf('%s-%02d-01', strftime('%Y', {lt}), "
+               "(CAST(strftime('%m', {lt}) AS INTEGER) - 1) / 3 * 3 + 1)",
+}
+
+_STEP_SQL = {
+    'day': "'+1 day'",
+    'week': "'+7 days'",
+    'month': "'+1 month'",
+    'quarter': "'+3 months'",
+}
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'quarter':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+
+def count_buckets(start: date, end: date, granularity: str) -> int:
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    if granularity == 'day':
+        return (last - first).days + 1
+    if granularity == 'week':
+        return (last - first).days // 7 + 1
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // (3 if granularity == 'quarter' else 1) + 1
+
+
+def utc_offsets(tz: ZoneInfo, start: datetime, end: datetime) -> List[Tuple[datetime, int]]:
+    """
+    UTC offsets (seconds) in effect over [start, end), as (from_utc, offset)
+    pairs. Stored dates are naive UTC. Probes daily and refines each change
+    to 15 minutes, so a multi-year range costs a few thousand lookups.
+    """
+    def offset_at(moment: datetime) -> int:
+        return int(moment.replace(tzinfo=timezone.utc).astimezone(tz).utcoffset().total_seconds())
+
+    offsets = [(start, offset_at(start))]
+    moment = start
+    while moment < end:
+        step = min(moment + timedelta(days=1), end)
+        if offset_at(step) != offsets[-1][1]:
+            probe = moment
+            while offset_at(probe) == offsets[-1][1]:
+                probe += timedelta(minutes=15)
+            offsets.append((probe, offset_at(probe)))
+        moment = step
+    return offsets
+
+
+def time_series(
+    db: Session,
+    user_id: int,
+    start: date,
+    end: date,
+    granularity: str = 'day',
+    tz_name: str = 'UTC'
+) -> Dict:
+    """
+    Spending between two local dates (inclusive) bucketed by day, week,
+    month or quarter in the user's time zone. Bucketing and gap-filling run
+    in SQLite; the result is parallel arrays of bucket start dates, totals
+    and transaction counts.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if end < start:
+        raise ValueError("end must not be before start")
+    if count_buckets(start, end, granularity) > MAX_BUCKETS:
+        raise ValueError(f"Range covers more than {MAX_BUCKETS} buckets")
+    tz = ZoneInfo(tz_name)
+
+    # Local day boundaries as naive UTC, so the user/date index does the filtering
+    utc_start = datetime.combine(start, datetime.min.time(), tz).astimezone(timezone.utc).replace(tzinfo=None)
+    utc_end = datetime.combine(end + timedelta(days=1), datetime.min.time(), tz)\
+        .astimezone(timezone.utc).replace(tzinfo=None)
+
+    params = {
+        "user_id": user_id,
+        "utc_start": utc_start.strftime(_STORED_FORMAT),
+        "utc_end": utc_end.strftime(_STORED_FORMAT),
+        "first_bucket": bucket_start(start, granularity).isoformat(),
+        "last_bucket": bucket_start(end, granularity).isoformat(),
+    }
+    offsets = utc_offsets(tz, utc_start, utc_end)
+    if len(offsets) == 1:
+        offset_sql = ":offset_0"
+    else:
+        whens = " ".join(
+            f"WHEN t.date < :change_{i} THEN :offset_{i - 1}" for i in range(1, len(offsets))
+        )
+        offset_sql = f"CASE {whens} ELSE :offset_{len(offsets) - 1} END"
+    for i, (changes_at, offset) in enumerate(offsets):
+        params[f"offset_{i}"] = f"{offset:+d} seconds"
+        if i:
+            params[f"change_{i}"] = changes_at.strftime(_STORED_FORMAT)
+
+    local_time = f"datetime(t.date, {offset_sql})"
+    bucket = _BUCKET_SQL[granularity].format(lt=local_time)
+    rows = db.execute(text(f"""
+        WITH RECURSIVE buckets(bucket) AS (
+            SELECT :first_bucket
+            UNION ALL
+            SELECT date(bucket, {_STEP_SQL[granularity]}) FROM buckets
+            WHERE bucket < :last_bucket
+        ),
+        totals AS (
+            SELECT {bucket} AS bucket,
+                   SUM(ABS(t.amount_cents)) AS cents,
+                   COUNT(*) AS n
+            FROM transactions t
+            WHERE t.user_id = :user_id AND t.date >= :utc_start AND t.date < :utc_end
+            GROUP BY 1
+        )
+        SELECT buckets.bucket AS bucket,
+               COALESCE(totals.cents, 0) AS cents,
+               COALESCE(totals.n, 0) AS n
+        FROM buckets LEFT JOIN totals ON totals.bucket = buckets.bucket
+        ORDER BY buckets.bucket
+    """).columns(bucket=String, cents=Integer, n=Integer), params).all()
+
+    return {
+        "granularity": granularity,
+        "tz": tz_name,
+        "buckets": [row.bucket for row in rows],
+        "totals": [from_cents(row.cents) for row in rows],
+        "counts": [row.n for row in rows]
+    }
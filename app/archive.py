@@ -0,0 +1,244 @@
+import glob
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .config import Config
+from .models.database import Base, Transaction, engine
+from .search import ensure_search_index
+from .shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+# How SQLAlchemy stores DateTime in SQLite; bound values must compare as text
+_STORED_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# Listed explicitly: migrated hot tables may order their columns differently
+_COLUMNS = ", ".join(column.name for column in Transaction.__table__.columns)
+
+_ARCHIVE_RE = re.compile(r'_archive_(\d{4})\.db$')
+
+# SQLite's default limit on attached databases
+MAX_ATTACHED_ARCHIVES = 10
+
+_archive_engines: Dict[str, Engine] = {}
+_archive_engines_lock = threading.Lock()
+
+
+def _database_root(hot_engine: Engine) -> Optional[str]:
+    database = hot_engine.url.database
+    if hot_engine.dialect.name != 'sqlite' or not database or database == ':memory:':
+        return None
+    return os.path.splitext(database)[0]
+
+
+def archive_path(hot_engine: Engine, year: int) -> Optional[str]:
+    """File holding one year of a database's archived transactions, next to it"""
+    root = _database_root(hot_engine)
+    return f"{root}_archive_{year}.db" if root else None
+
+
+def archive_paths(hot_engine: Engine) -> Dict[int, str]:
+    """Existing archive files for a database, by year"""
+    root = _database_root(hot_engine)
+    if root is None:
+        return {}
+    paths = {}
+    for path in glob.glob(f"{glob.escape(root)}_archive_*.db"):
+        match = _ARCHIVE_RE.search(path)
+        if match:
+            paths[int(match.group(1))] = path
+    return dict(sorted(paths.items()))
+
+
+def archive_cutoff(now: Optional[datetime] = None, months: int = Config.ARCHIVE_AFTER_MONTHS) -> datetime:
+    """
+    Start of the oldest month kept hot. Everything before it is a closed
+    month. Twelve months keeps every dashboard window hot.
+    """
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def open_archive(path: str) -> Engine:
+    """
+    Engine for one archive file, creating its table and its own search
+    index on first use. The index triggers live in the archive schema, so
+    they also fire for rows copied in through ATTACH.
+    """
+    with _archive_engines_lock:
+        archive_engine = _archive_engines.get(path)
+        if archive_engine is None:
+            archive_engine = create_engine(f"sqlite:///{path}")
+            Base.metadata.create_all(bind=archive_engine, tables=[Transaction.__table__])
+            ensure_search_index(archive_engine)
+            _archive_engines[path] = archive_engine
+        return archive_engine
+
+
+def _archive_years(hot_engine: Engine, start: Optional[date], end: Optional[date]) -> Dict[int, str]:
+    if start is not None and start >= archive_cutoff().date():
+        return {}
+    return {
+        year: path for year, path in archive_paths(hot_engine).items()
+        if (start is None or year >= start.year) and (end is None or year <= end.year)
+    }
+
+
+def archive_closed_months(hot_engine: Engine, now: Optional[datetime] = None) -> Dict[int, int]:
+    """
+    Move transactions older than archive_cutoff() out of a hot database
+    into one archive file per year. Each year is copied and deleted in one
+    transaction, together with a data version bump for each user whose rows
+    moved. The copy skips ids already archived, so an interrupted run is
+    safe to repeat. Returns the number of rows moved per year.
+    """
+    if _database_root(hot_engine) is None:
+        return {}
+    cutoff = archive_cutoff(now).strftime(_STORED_FORMAT)
+    moved: Dict[int, int] = {}
+    with hot_engine.connect() as conn:
+        years = [
+            int(year) for (year,) in conn.exec_driver_sql(
+                "SELECT DISTINCT strftime('%Y', date) FROM transactions WHERE date < ?", (cutoff,)
+            )
+        ]
+        conn.rollback()
+        for year in years:
+            path = archive_path(hot_engine, year)
+            open_archive(path)
+            lower = datetime(year, 1, 1).strftime(_STORED_FORMAT)
+            upper = min(datetime(year + 1, 1, 1).strftime(_STORED_FORMAT), cutoff)
+            conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (path,))
+            try:
+                # The newest row always stays, so SQLite never hands out an
+                # archived id again
+                window = "date >= ? AND date < ? AND id < (SELECT MAX(id) FROM main.transactions)"
+                conn.exec_driver_sql(
+                    f"INSERT OR IGNORE INTO archive.transactions ({_COLUMNS}) "
+                    f"SELECT {_COLUMNS} FROM main.transactions WHERE {window}",
+                    (lower, upper)
+                )
+                # Every cached view of the moved rows (ETags, columnar
+                # columns, stored reports) is keyed by the data version
+                conn.exec_driver_sql(
+                    "INSERT INTO main.user_versions (user_id, data_version) "
+                    f"SELECT user_id, COUNT(*) FROM main.transactions WHERE {window} AND user_id IS NOT NULL "
+                    "GROUP BY user_id "
+                    "ON CONFLICT (user_id) DO UPDATE SET data_version = data_version + excluded.data_version",
+                    (lower, upper)
+                )
+                moved[year] = conn.exec_driver_sql(
+                    f"DELETE FROM main.transactions WHERE {window}", (lower, upper)
+                ).rowcount
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.exec_driver_sql("DETACH DATABASE archive")
+                conn.commit()
+    return moved
+
+
+def run_archival(now: Optional[datetime] = None) -> int:
+    """Archive closed months in the main database and every shard"""
+    if Config.ARCHIVE_AFTER_MONTHS <= 0:
+        return 0
+    engines = [engine]
+    if shard_router is not None:
+        engines += [shard_router.engine(shard) for shard in range(shard_router.count)]
+    total = 0
+    for hot_engine in engines:
+        moved = archive_closed_months(hot_engine, now)
+        if moved:
+            logger.info("Archived %s from %s", moved, hot_engine.url.database)
+        total += sum(moved.values())
+    return total
+
+
+def _detach_archives(dbapi_connection, connection_record) -> None:
+    names = connection_record.info.pop('archives', None)
+    if not names:
+        return
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("DROP VIEW IF EXISTS temp.transactions")
+        for name in names:
+            cursor.execute(f"DETACH DATABASE {name}")
+        cursor.close()
+    except Exception:
+        # A pooled connection must never keep the read-only view
+        logger.exception("Detaching archives failed; discarding connection")
+        connection_record.invalidate()
+
+
+def _attach_archives(connection, paths: Dict[int, str]) -> None:
+    if 'archives' in connection.info:
+        return
+    hot_engine = connection.engine
+    if not event.contains(hot_engine, "checkin", _detach_archives):
+        event.listen(hot_engine, "checkin", _detach_archives)
+
+    names: List[str] = []
+    connection.info['archives'] = names
+    for year, path in paths.items():
+        names.append(f"archive_{year}")
+        connection.exec_driver_sql(f"ATTACH DATABASE ? AS {names[-1]}", (path,))
+    selects = [f"SELECT {_COLUMNS} FROM main.transactions"] + [
+        f"SELECT {_COLUMNS} FROM {name}.transactions" for name in names
+    ]
+    # Unqualified names resolve to temp first, so every ORM query, Core
+    # select and raw SQL reading "transactions" sees hot and archived rows
+    connection.exec_driver_sql(f"CREATE TEMP VIEW transactions AS {' UNION ALL '.join(selects)}")
+
+
+def include_archives(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Session:
+    """
+    Make a session's reads of transactions also cover the archived years
+    overlapping start..end (inclusive dates), by attaching those archive
+    files and shadowing the table with a view. Only for reads that ask for
+    history: a range starting at or after archive_cutoff() attaches nothing.
+    Call before the session's first query. Such a session can't write
+    transactions; the archives are detached when its connection goes back
+    to the pool. Raises ValueError for more than MAX_ATTACHED_ARCHIVES years.
+    """
+    hot_engine = db.get_bind(Transaction)
+    paths = _archive_years(hot_engine, start, end)
+    if not paths:
+        return db
+    if len(paths) > MAX_ATTACHED_ARCHIVES:
+        raise ValueError(f"Range covers more than {MAX_ATTACHED_ARCHIVES} archived years")
+
+    def attach(session: Session, transaction, connection) -> None:
+        if connection.engine is hot_engine:
+            _attach_archives(connection, paths)
+
+    event.listen(db, "after_begin", attach)
+    return db
+
+
+@contextmanager
+def archive_sessions(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[List[Session]]:
+    """
+    Read-only sessions on each archive file of db's database overlapping
+    start..end (inclusive dates), oldest year first; empty when the range
+    is all hot. For reads that query every source separately and merge,
+    with no limit on the number of years.
+    """
+    paths = _archive_years(db.get_bind(Transaction), start, end)
+    sessions = [Session(bind=open_archive(path)) for path in paths.values()]
+    try:
+        yield sessions
+    finally:
+        for session in sessions:
+            session.close()
@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+from mimetypes import guess_type
+from typing import Dict, Optional, Set
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always produced
+    brotli = None
+
+STATIC_DIR = "app/static"
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+ASSET_EXTENSIONS = ('.css', '.js', '.svg')
+PAGES = ('index.html', 'login.html', 'signup.html')
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Encodings in server preference order with their file suffixes
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_FINGERPRINT_RE = re.compile(r'\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+
+
+def _compress_variants(path: str, data: bytes) -> None:
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """
+    Fingerprint and pre-compress static assets, then rewrite the HTML pages
+    to reference the fingerprinted URLs. Returns the asset manifest.
+    Run as a build step with `python -m app.assets`.
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir]
+        for name in sorted(files):
+            if not name.endswith(ASSET_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            rel_path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, ext = os.path.splitext(rel_path)
+            hashed_path = f"{stem}.{digest}{ext}"
+
+            target = os.path.join(dist_dir, hashed_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            _compress_variants(target, data)
+            manifest[rel_path] = f"{DIST_DIR}/{hashed_path}"
+
+    pages_dir = os.path.join(dist_dir, 'pages')
+    os.makedirs(pages_dir, exist_ok=True)
+    for page in PAGES:
+        with open(os.path.join(static_dir, page), 'rb') as f:
+            html = rewrite_asset_urls(f.read().decode('utf-8'), manifest)
+        target = os.path.join(pages_dir, page)
+        data = html.encode('utf-8')
+        with open(target, 'wb') as f:
+            f.write(data)
+        _compress_variants(target, data)
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def rewrite_asset_urls(html: str, manifest: Dict[str, str]) -> str:
+    """
+    Replace /static/<asset> references with their fingerprinted URLs
+    """
+    def replace(match):
+        rel_path = match.group(1)
+        return f"/static/{manifest.get(rel_path, rel_path)}"
+
+    return re.sub(r'/static/([\w./-]+)', replace, html)
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """
+    Parse an Accept-Encoding header into the set of acceptable codings
+    """
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves .br/.gz siblings when the client accepts them and
+    marks fingerprinted files as immutable
+    """
+
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        media_type = guess_type(full_path)[0] or 'text/plain'
+        accepted = accepted_encodings(request_headers.get('accept-encoding'))
+
+        response = None
+        for encoding, suffix in ENCODINGS:
+            candidate = full_path + suffix
+            if encoding in accepted and os.path.isfile(candidate):
+                response = FileResponse(
+                    candidate,
+                    status_code=status_code,
+                    stat_result=os.stat(candidate),
+                    media_type=media_type
+                )
+                response.headers['content-encoding'] = encoding
+                break
+        if response is None:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                stat_result=stat_result,
+                media_type=media_type
+            )
+
+        response.headers['vary'] = 'Accept-Encoding'
+        if _FINGERPRINT_RE.search(full_path):
+            response.headers['cache-control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers['cache-control'] = REVALIDATE_CACHE_CONTROL
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class PageStore:
+    """
+    In-memory HTML pages with their encoded variants, loaded once per process
+    """
+
+    def __init__(self, static_dir: str = STATIC_DIR):
+        self.static_dir = static_dir
+        self._pages: Dict[str, Dict] = {}
+
+    def _load(self, name: str) -> Dict:
+        built = os.path.join(self.static_dir, DIST_DIR, 'pages', name)
+        if os.path.isfile(built):
+            with open(built, 'rb') as f:
+                identity = f.read()
+            variants = {}
+            for encoding, suffix in ENCODINGS:
+                if os.path.isfile(built + suffix):
+                    with open(built + suffix, 'rb') as f:
+                        variants[encoding] = f.read()
+        else:
+            # No build output (e.g. during development), so compress on load
+            with open(os.path.join(self.static_dir, name), 'rb') as f:
+                identity = f.read()
+            variants = {'gzip': gzip.compress(identity, compresslevel=9, mtime=0)}
+
+        variants[None] = identity
+        # Strong validators name exact bytes, so each encoding gets its own
+        digest = hashlib.sha1(identity).hexdigest()
+        etags = {
+            encoding: '"%s"' % (digest if encoding is None else f"{digest}-{encoding}")
+            for encoding in variants
+        }
+        return {'variants': variants, 'etags': etags}
+
+    def response(self, request: Request, name: str) -> Response:
+        page = self._pages.get(name)
+        if page is None:
+            page = self._pages[name] = self._load(name)
+
+        accepted = accepted_encodings(request.headers.get('accept-encoding'))
+        encoding = next(
+            (encoding for encoding, _ in ENCODINGS if encoding in accepted and encoding in page['variants']),
+            None
+        )
+        headers = {
+            "ETag": page['etags'][encoding],
+            "Cache-Control": REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding"
+        }
+        if_none_match = request.headers.get('if-none-match', '')
+        if headers["ETag"] in (candidate.strip() for candidate in if_none_match.split(',')):
+            return Response(status_code=304, headers=headers)
+
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(page['variants'][encoding], media_type="text/html", headers=headers)
+
+
+page_store = PageStore()
+
+
+if __name__ == "__main__":
+    built = build_assets()
+    print(f"Built {len(built)} assets into {os.path.join(STATIC_DIR, DIST_DIR)}")
@@ -0,0 +1,40 @@
+"""
+Lazy back-fill of the per-user indexes the insert paths keep current.
+Rows stored before an index existed are folded in by rebuilding it from
+the user's full history the first time it is read.
+"""
+from typing import Callable, Dict
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .cache import bump_data_version
+from .models.database import HistoryBackfill
+from .recurring import rebuild_series
+from .sketches import rebuild_sketches
+
+REBUILDERS: Dict[str, Callable[[Session, int], int]] = {
+    "recurring": rebuild_series,
+    "sketches": rebuild_sketches,
+}
+
+
+def ensure_backfilled(db: Session, user_id: int, name: str) -> bool:
+    """
+    Rebuild the named index for a user unless that was done already, in
+    one transaction with its marker and a data version bump, so responses
+    cached from the partial index are not served again. Call before
+    reading the index. Returns whether it rebuilt.
+    """
+    if db.get(HistoryBackfill, (user_id, name)) is not None:
+        return False
+    try:
+        REBUILDERS[name](db, user_id)
+        db.add(HistoryBackfill(user_id=user_id, name=name))
+        bump_data_version(db, user_id)
+        db.commit()
+    except IntegrityError:
+        # A concurrent request back-filled it first
+        db.rollback()
+        return False
+    return True
@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+from typing import Any, Callable, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .assets import accepted_encodings
+from .models.database import UserVersion
+from .cache_backend import shared_cache
+from .serialization import dumps
+
+
+def get_data_version(db: Session, user_id: int) -> int:
+    """
+    Return the current data version for a user (0 before their first write)
+    """
+    version = db.query(UserVersion.data_version).filter(UserVersion.user_id == user_id).scalar()
+    return version or 0
+
+
+def bump_data_version(db: Session, user_id: int, writes: int = 1) -> None:
+    """
+    Increment a user's data version (once per write). Call before committing
+    any write to that user's data, on the same session, so the bump lands in
+    the same transaction (and the same shard).
+    """
+    db.execute(
+        insert(UserVersion)
+        .values(user_id=user_id, data_version=writes)
+        .on_conflict_do_update(
+            index_elements=[UserVersion.user_id],
+            set_={"data_version": UserVersion.data_version + writes}
+        )
+    )
+
+
+# Serialized payloads are keyed by data version, so stale ones are never read
+# again; the TTL only bounds how long they occupy a shared backend
+RESPONSE_TTL = 24 * 60 * 60
+
+# Smaller bodies are sent as they are; also GZipMiddleware's threshold
+GZIP_MINIMUM_SIZE = 1024
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate == etag:
+            return True
+    return False
+
+
+async def cached_json_response(
+    request: Request,
+    db: Session,
+    user_id: int,
+    endpoint: str,
+    params: Tuple,
+    compute: Callable[[], Any]
+) -> Response:
+    """
+    Serve a per-user JSON payload with a strong ETag, answering 304 when the
+    client already has the current version and reusing the serialized body
+    while the user's data version is unchanged. Large bodies are gzipped
+    here, once per version, under their own ETag like PageStore's pages;
+    GZipMiddleware passes them through. Runs in the threadpool: a miss can
+    wait on another worker's cache lease, and compute queries the database.
+    """
+    return await run_in_threadpool(_cached_json_response, request, db, user_id, endpoint, params, compute)
+
+
+def _cached_json_response(
+    request: Request,
+    db: Session,
+    user_id: int,
+    endpoint: str,
+    params: Tuple,
+    compute: Callable[[], Any]
+) -> Response:
+    version = get_data_version(db, user_id)
+    key = f"json-response:{user_id}:{endpoint}:{params!r}:{version}"
+
+    def serialize():
+        body = dumps(compute())
+        # mtime=0 keeps the bytes, and so the ETag, identical across workers
+        gzipped = gzip.compress(body, mtime=0) if len(body) >= GZIP_MINIMUM_SIZE else None
+        return body, gzipped, hashlib.sha1(body).hexdigest()
+
+    body, gzipped, digest = shared_cache.get_or_compute(key, serialize, ttl=RESPONSE_TTL)
+    headers = {"ETag": '"%s"' % digest, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if gzipped is not None and 'gzip' in accepted_encodings(request.headers.get('accept-encoding')):
+        body = gzipped
+        headers["ETag"] = '"%s-gzip"' % digest
+        headers["Content-Encoding"] = "gzip"
+    if _etag_matches(request, headers["ETag"]):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,224 @@
+import abc
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from .config import Config
+
+
+class CacheBackend(abc.ABC):
+    """
+    Key/value cache interface. Keys are strings; values must be picklable
+    for backends shared between processes. Every method may block, so call
+    them from a worker thread, not the event loop.
+    """
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value for key, or compute and store it. Concurrent
+        callers for the same key wait for a single computation. Exceptions
+        from compute propagate and nothing is stored.
+        """
+
+
+class _KeyLocks:
+    """Per-key locks so threads in one process compute a key only once"""
+
+    def __init__(self):
+        self._locks: Dict[str, list] = {}
+        self._guard = threading.Lock()
+
+    def acquire(self, key: str) -> threading.Lock:
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        return entry[0]
+
+    def release(self, key: str) -> None:
+        with self._guard:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+class InProcessLRUBackend(CacheBackend):
+    """Thread-safe LRU with optional per-entry TTL, private to this process"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = _KeyLocks()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+        self._key_locks.acquire(key)
+        try:
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                self.set(key, value, ttl)
+            return value
+        finally:
+            self._key_locks.release(key)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache in a local SQLite file shared by every worker process on the host.
+    get_or_compute takes a lease row so only one process computes a key;
+    the others poll until the value appears or the lease expires.
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, lease_timeout: float = 30.0, poll_interval: float = 0.05):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._key_locks = _KeyLocks()
+        self._sets = 0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_leases ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return None
+        return pickle.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + ttl if ttl else None)
+        )
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def _acquire_lease(self, key: str, owner: str) -> bool:
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache_leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE cache_leases.expires_at < ?",
+            (key, owner, now + self.lease_timeout, now)
+        )
+        return cursor.rowcount == 1
+
+    def _release_lease(self, key: str, owner: str) -> None:
+        self._connection().execute(
+            "DELETE FROM cache_leases WHERE key = ? AND owner = ?", (key, owner)
+        )
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        self._key_locks.acquire(key)
+        try:
+            owner = uuid.uuid4().hex
+            while True:
+                value = self.get(key)
+                if value is not None:
+                    return value
+                if self._acquire_lease(key, owner):
+                    break
+                time.sleep(self.poll_interval)
+
+            try:
+                value = self.get(key)
+                if value is None:
+                    value = compute()
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                self._release_lease(key, owner)
+        finally:
+            self._key_locks.release(key)
+
+
+def create_cache_backend() -> CacheBackend:
+    """
+    Build the backend selected by CACHE_BACKEND ('memory' or 'sqlite')
+    """
+    if Config.CACHE_BACKEND == 'sqlite':
+        return SQLiteCacheBackend(Config.CACHE_PATH)
+    return InProcessLRUBackend()
+
+
+shared_cache = create_cache_backend()
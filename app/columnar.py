@@ -0,0 +1,249 @@
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.orm import Session
+
+from .cache import get_data_version
+from .config import Config
+from .models.database import Transaction
+from .utils import to_cents
+
+
+class TransactionColumns:
+    """
+    Struct-of-arrays view of a set of transactions: amounts in cents,
+    timestamps and category codes, with amortized O(1) appends
+    """
+    __slots__ = (
+        'size', 'version', 'categories', '_category_index', '_amount_cents',
+        '_timestamps', '_category_codes', '_predicted_codes', 'descriptions',
+        '_description_bytes'
+    )
+
+    def __init__(self, capacity: int = 16, version: Hashable = None):
+        capacity = max(capacity, 16)
+        self.size = 0
+        self.version = version
+        self.categories: List[Optional[str]] = []
+        self._category_index: Dict[Optional[str], int] = {}
+        self._amount_cents = np.zeros(capacity, dtype=np.int64)
+        self._timestamps = np.zeros(capacity, dtype='datetime64[us]')
+        self._category_codes = np.zeros(capacity, dtype=np.int32)
+        self._predicted_codes = np.zeros(capacity, dtype=np.int32)
+        self.descriptions: List[str] = []
+        self._description_bytes = 0
+
+    @classmethod
+    def from_rows(cls, rows: Iterable, version: Hashable = None) -> 'TransactionColumns':
+        """
+        Build from (amount_cents, date, category, predicted_category, description)
+        rows. Dates may be datetimes or ISO strings as SQLite stores them.
+        """
+        rows = list(rows)
+        columns = cls(capacity=len(rows), version=version)
+        n = len(rows)
+        if n:
+            amounts, dates, categories, predicted, descriptions = zip(*rows)
+            columns._amount_cents[:n] = amounts
+            columns._timestamps[:n] = np.array(dates, dtype='datetime64[us]')
+            for category in dict.fromkeys(categories + predicted):
+                columns.code(category)
+            lookup = columns._category_index.__getitem__
+            columns._category_codes[:n] = np.fromiter(map(lookup, categories), dtype=np.int32, count=n)
+            columns._predicted_codes[:n] = np.fromiter(map(lookup, predicted), dtype=np.int32, count=n)
+            columns.descriptions = [d or '' for d in descriptions]
+            columns._description_bytes = sum(sys.getsizeof(d) for d in columns.descriptions)
+            columns.size = n
+        return columns
+
+    @classmethod
+    def from_dicts(cls, transactions: List[Dict]) -> 'TransactionColumns':
+        """
+        Build from the per-row dicts the AI endpoints have always produced
+        """
+        return cls.from_rows(
+            (
+                to_cents(t['amount']),
+                t.get('date') or datetime.utcnow(),
+                t.get('category'),
+                t.get('predicted_category'),
+                t.get('description', '')
+            )
+            for t in transactions
+        )
+
+    def code(self, category: Optional[str]) -> int:
+        index = self._category_index.get(category)
+        if index is None:
+            index = self._category_index[category] = len(self.categories)
+            self.categories.append(category)
+        return index
+
+    def append(self, amount_cents: int, date: datetime, category: Optional[str],
+               predicted_category: Optional[str], description: str) -> None:
+        if self.size == len(self._amount_cents):
+            capacity = len(self._amount_cents) * 2
+            for name in ('_amount_cents', '_timestamps', '_category_codes', '_predicted_codes'):
+                grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, grown)
+        i = self.size
+        self._amount_cents[i] = amount_cents
+        self._timestamps[i] = np.datetime64(date, 'us')
+        self._category_codes[i] = self.code(category)
+        self._predicted_codes[i] = self.code(predicted_category)
+        self.descriptions.append(description or '')
+        self._description_bytes += sys.getsizeof(self.descriptions[-1])
+        self.size += 1
+
+    @property
+    def amount_cents(self) -> np.ndarray:
+        return self._amount_cents[:self.size]
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self._amount_cents[:self.size] / 100.0
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._timestamps[:self.size]
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self._category_codes[:self.size]
+
+    @property
+    def predicted_codes(self) -> np.ndarray:
+        return self._predicted_codes[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self._amount_cents.nbytes + self._timestamps.nbytes
+            + self._category_codes.nbytes + self._predicted_codes.nbytes
+            + self._description_bytes
+        )
+
+    def row(self, i: int) -> Dict:
+        """
+        Materialize one row as the dict shape AIService has always returned
+        """
+        return {
+            "amount": int(self._amount_cents[i]) / 100,
+            "predicted_category": self.categories[self._predicted_codes[i]],
+            "description": self.descriptions[i],
+            "date": self._timestamps[i].astype(datetime)
+        }
+
+    def snapshot(self) -> 'TransactionColumns':
+        """
+        Fixed-size view sharing the same arrays, so readers see consistent
+        columns while appends continue on the cached instance
+        """
+        view = TransactionColumns.__new__(TransactionColumns)
+        for name in TransactionColumns.__slots__:
+            setattr(view, name, getattr(self, name))
+        return view
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def select_columns(user_id: Optional[int] = None):
+    """
+    Core SELECT of the TransactionColumns fields in date order. Dates come
+    back as the stored text, which numpy parses in one vectorized call
+    instead of a datetime per row.
+    """
+    statement = select(
+        Transaction.amount_cents,
+        type_coerce(Transaction.date, String),
+        Transaction.category,
+        Transaction.predicted_category,
+        Transaction.description
+    )
+    if user_id is not None:
+        statement = statement.where(Transaction.user_id == user_id)
+    return statement.order_by(Transaction.date.asc(), Transaction.id.asc())
+
+
+class ColumnarCache:
+    """
+    Per-user TransactionColumns, loaded lazily, appended to on insert and
+    evicted least-recently-used once the memory budget is exceeded. The
+    legacy unscoped view (no user) is loaded per call, never cached: it
+    would hold every user's rows and has no data version.
+    """
+
+    def __init__(self, memory_budget: int = Config.COLUMNAR_CACHE_BYTES):
+        self.memory_budget = memory_budget
+        self._entries: "OrderedDict[int, TransactionColumns]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: Optional[int]) -> TransactionColumns:
+        if user_id is None:
+            return TransactionColumns.from_rows(db.execute(select_columns()).all())
+
+        version = get_data_version(db, user_id)
+        with self._lock:
+            columns = self._entries.get(user_id)
+            if columns is not None and columns.version == version:
+                self._entries.move_to_end(user_id)
+                return columns.snapshot()
+
+        columns = TransactionColumns.from_rows(db.execute(select_columns(user_id)).all(), version=version)
+        if get_data_version(db, user_id) != version:
+            # A write landed around the load, so the rows may be newer than
+            # the version; serve them but let the next read reload
+            return columns
+
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is None or cached.version <= version:
+                self._entries[user_id] = columns
+                self._entries.move_to_end(user_id)
+                self._evict()
+            return columns.snapshot()
+
+    def append(self, user_id: int, transaction: Transaction, version: int) -> None:
+        """
+        Append a just-committed transaction if the user's columns are loaded
+        and were current as of the previous version; otherwise drop them so
+        the next read reloads. Columns loaded at or after this version
+        already hold the row.
+        """
+        with self._lock:
+            columns = self._entries.get(user_id)
+            if columns is None or columns.version >= version:
+                return
+            if columns.version != version - 1:
+                del self._entries[user_id]
+                return
+            columns.append(
+                transaction.amount_cents,
+                transaction.date,
+                transaction.category,
+                transaction.predicted_category,
+                transaction.description
+            )
+            columns.version = version
+            self._evict()
+
+    def _evict(self) -> None:
+        total = sum(columns.nbytes for columns in self._entries.values())
+        while total > self.memory_budget and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            total -= evicted.nbytes
+
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(columns.nbytes for columns in self._entries.values())
+
+
+columnar_cache = ColumnarCache()
+
@@ -6,4 +6,23 @@ load_dotenv()
 class Config:
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///finance_tracker.db')
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-    MODEL_NAME = "gpt-3.5-turbo"
\ No newline at end of file
+    MODEL_NAME = "gpt-3.5-turbo"
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')  # 'sqlite' shares the cache across workers
+    CACHE_PATH = os.getenv('CACHE_PATH', 'finance_tracker_cache.db')
+    COLUMNAR_CACHE_BYTES = int(os.getenv('COLUMNAR_CACHE_BYTES', 64 * 1024 * 1024))
+    REPORT_HOUR = int(os.getenv('REPORT_HOUR', 3))  # Local hour for the nightly AI report run
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 4))  # Threads in the nightly report pass
+    REPORT_LLM_CALLS_PER_SECOND = float(os.getenv('REPORT_LLM_CALLS_PER_SECOND', 2))
+    GROUP_COMMIT_MAX_LATENCY = float(os.getenv('GROUP_COMMIT_MAX_LATENCY', 0.005))  # Seconds an insert may wait for company
+    GROUP_COMMIT_BATCH_SIZE = int(os.getenv('GROUP_COMMIT_BATCH_SIZE', 256))
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0))  # Above 1 spreads users' transactions over that many SQLite files
+    SHARD_PATH = os.getenv('SHARD_PATH', 'finance_tracker_shard_{shard}.db')
+    ARCHIVE_AFTER_MONTHS = int(os.getenv('ARCHIVE_AFTER_MONTHS', 12))  # Closed months older than this move to yearly archive files; 0 disables
+    INSIGHTS_CONCURRENCY = int(os.getenv('INSIGHTS_CONCURRENCY', 4))  # Requests past these limits get fallbacks, not a queue
+    BUDGET_CONCURRENCY = int(os.getenv('BUDGET_CONCURRENCY', 8))
+    CLASSIFY_CONCURRENCY = int(os.getenv('CLASSIFY_CONCURRENCY', 8))
+    LLM_USER_RATE = float(os.getenv('LLM_USER_RATE', 0.2))  # LLM-backed requests per user per second, sustained
+    LLM_USER_BURST = float(os.getenv('LLM_USER_BURST', 5))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 10))  # Seconds before an OpenAI call counts as failed
+    LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 5))  # Consecutive failures that open the circuit
+    LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))  # Seconds before a trial call is let through
@@ -0,0 +1,154 @@
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .archive import archive_cutoff, archive_sessions
+from .cache import bump_data_version
+from .models.database import Transaction
+from .recurring import record_transactions
+from .sketches import record_amounts
+from .utils import dedup_key, to_cents
+
+# SQLite caps bound parameters per statement; stay well under it
+LOOKUP_CHUNK = 500
+
+INSERT_COLUMNS = (
+    'user_id', 'amount_cents', 'description', 'category', 'date',
+    'predicted_category', 'confidence_score', 'dedup_key', 'idempotency_key'
+)
+
+
+def prepare_transaction(values: Dict) -> Dict:
+    """
+    Copy of Transaction column values with amount_cents, date and
+    dedup_key filled in. 'amount' (dollars) is accepted in place of
+    amount_cents. A truthy 'allow_duplicate' leaves dedup_key empty, which
+    exempts the row from content duplicate checks. Dates with an
+    offset are converted to naive UTC, the form every stored date has.
+    """
+    values = dict(values)
+    if 'amount' in values:
+        values['amount_cents'] = to_cents(values.pop('amount'))
+    if not values.get('date'):
+        values['date'] = datetime.utcnow()
+    elif values['date'].tzinfo is not None:
+        values['date'] = values['date'].astimezone(timezone.utc).replace(tzinfo=None)
+    if values.pop('allow_duplicate', False):
+        values['dedup_key'] = None
+    else:
+        values['dedup_key'] = dedup_key(values.get('description'), values['amount_cents'], values['date'])
+    return values
+
+
+def _chunks(items: List, size: int = LOOKUP_CHUNK) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_existing(db: Session, prepared: List[Dict], by_content: bool = True) -> Dict[Tuple, Transaction]:
+    """
+    Already-stored transactions matching any of the prepared rows, keyed by
+    ('idempotency', user_id, key) or, with by_content, ('dedup', user_id,
+    dedup_key). Every lookup is an indexed probe; nothing is scanned. Rows
+    dated before archive_cutoff() that match nothing hot are also probed in
+    the archive file for their year; those matches come back detached.
+    """
+    found: Dict[Tuple, Transaction] = {}
+    _probe(db, prepared, by_content, found)
+
+    cutoff = archive_cutoff()
+    unmatched_by_year: Dict[int, List[Dict]] = {}
+    for values in prepared:
+        identity = duplicate_identity(values, by_content)
+        if identity is not None and identity not in found and values['date'] < cutoff:
+            unmatched_by_year.setdefault(values['date'].year, []).append(values)
+    for year, unmatched in unmatched_by_year.items():
+        with archive_sessions(db, date(year, 1, 1), date(year, 12, 31)) as archived:
+            for archive in archived:
+                _probe(archive, unmatched, by_content, found)
+    return found
+
+
+def _probe(db: Session, prepared: List[Dict], by_content: bool, found: Dict[Tuple, Transaction]) -> None:
+    idempotency = {(v['user_id'], v['idempotency_key']) for v in prepared if v.get('idempotency_key')}
+    dedup = {
+        (v['user_id'], v['dedup_key']) for v in prepared
+        if by_content and not v.get('idempotency_key') and v['dedup_key'] is not None
+    }
+    for kind, column, pairs in (
+        ('idempotency', Transaction.idempotency_key, idempotency),
+        ('dedup', Transaction.dedup_key, dedup),
+    ):
+        keys_by_user: Dict[int, List[str]] = {}
+        for user_id, key in pairs:
+            keys_by_user.setdefault(user_id, []).append(key)
+        for user_id, keys in keys_by_user.items():
+            for chunk in _chunks(keys):
+                matches = db.query(Transaction)\
+                    .filter(Transaction.user_id == user_id, column.in_(chunk))\
+                    .order_by(Transaction.id).all()
+                for transaction in matches:
+                    found.setdefault((kind, user_id, getattr(transaction, column.key)), transaction)
+
+
+def duplicate_identity(values: Dict, by_content: bool = True) -> Optional[Tuple]:
+    """
+    The key a prepared row is deduplicated on: its idempotency key when the
+    client sent one, otherwise (with by_content) its dedup key. None if the
+    row is not deduplicated.
+    """
+    if values.get('idempotency_key'):
+        return ('idempotency', values['user_id'], values['idempotency_key'])
+    if not by_content or values['dedup_key'] is None:
+        return None
+    return ('dedup', values['user_id'], values['dedup_key'])
+
+
+def bulk_insert_transactions(db: Session, user_id: int, rows: Iterable[Dict]) -> Dict[str, int]:
+    """
+    Insert many transactions for one user (e.g. a statement import),
+    skipping rows already stored or repeated within the load. Duplicates are
+    found with one set-based lookup per chunk rather than a probe per row.
+    Commits and bumps the data version once. If a concurrent insert claims
+    one of the idempotency keys first, the load is re-checked once; a second
+    conflict raises IntegrityError.
+    """
+    prepared = [prepare_transaction({**row, "user_id": user_id}) for row in rows]
+    try:
+        return _insert_fresh(db, user_id, prepared)
+    except IntegrityError:
+        db.rollback()
+        return _insert_fresh(db, user_id, prepared)
+
+
+def _insert_fresh(db: Session, user_id: int, prepared: List[Dict]) -> Dict[str, int]:
+    existing = find_existing(db, prepared)
+    existing_dedup = {key for kind, _, key in existing if kind == 'dedup'}
+    existing_idempotency = {key for kind, _, key in existing if kind == 'idempotency'}
+
+    fresh = []
+    for values in prepared:
+        key = values.get('idempotency_key')
+        if key:
+            if key in existing_idempotency:
+                continue
+            existing_idempotency.add(key)
+        elif values['dedup_key'] in existing_dedup:
+            continue
+        if values['dedup_key'] is not None:
+            existing_dedup.add(values['dedup_key'])
+        fresh.append({column: values.get(column) for column in INSERT_COLUMNS})
+
+    if fresh:
+        db.execute(Transaction.__table__.insert(), fresh)
+        record_transactions(db, (
+            (user_id, v['description'], v['amount_cents'], v['date']) for v in fresh
+        ))
+        record_amounts(db, (
+            (user_id, v['category'] or v['predicted_category'], v['amount_cents']) for v in fresh
+        ))
+        bump_data_version(db, user_id, len(fresh))
+        db.commit()
+    return {"inserted": len(fresh), "duplicates": len(prepared) - len(fresh)}
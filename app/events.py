@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import AsyncIterator, Dict, Set
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+
+class Subscription:
+    """
+    One connected dashboard stream. Kept deliberately small so hundreds of
+    idle connections cost little per worker.
+    """
+    __slots__ = ('user_id', 'queue', 'loop', 'overflowed')
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.loop = asyncio.get_running_loop()
+        self.overflowed = False
+
+
+class EventBroker:
+    """
+    Fan-out of per-user dashboard events (new transaction, quick stats,
+    anomaly) to server-sent event streams
+    """
+
+    def __init__(self, queue_size: int = 32, heartbeat_interval: float = 15.0):
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def has_subscribers(self, user_id: int) -> bool:
+        return user_id in self._subscribers
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, user_id: int, event: str, data) -> None:
+        """
+        Queue an event for every stream of a user. Safe to call from the event
+        loop or from a worker thread.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        if not subscribers:
+            return
+
+        message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        for subscription in subscribers:
+            if subscription.loop is running_loop:
+                self._deliver(subscription, message)
+            else:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, message)
+
+    @staticmethod
+    def _deliver(subscription: Subscription, message: str) -> None:
+        # A slow client must not grow memory without bound: once its queue is
+        # full, drop the backlog and tell it to resync from the REST endpoints
+        if subscription.overflowed:
+            return
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(RESYNC_MESSAGE)
+            subscription.overflowed = True
+            logger.debug(f"Event stream for user {subscription.user_id} overflowed")
+
+    async def stream(self, request: Request, user_id: int) -> AsyncIterator[str]:
+        """
+        Subscribe for the lifetime of the stream and yield SSE frames, with a
+        comment heartbeat when idle
+        """
+        subscription = self.subscribe(user_id)
+        try:
+            yield f"retry: {int(self.heartbeat_interval * 1000)}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=self.heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is RESYNC_MESSAGE:
+                    subscription.overflowed = False
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+
+event_broker = EventBroker()
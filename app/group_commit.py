@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .cache import bump_data_version
+from .columnar import columnar_cache
+from .config import Config
+from .dedup import duplicate_identity, find_existing, prepare_transaction
+from .models.database import SessionLocal, Transaction, UserVersion
+from .recurring import record_transactions
+from .sketches import record_amounts
+from .shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitWriter:
+    """
+    Collects transaction inserts from concurrent requests and commits them
+    together: a batch closes after max_latency seconds or batch_size rows,
+    whichever comes first, and every caller's future resolves with its
+    (detached, fully loaded) Transaction. One write lock and one fsync per
+    batch instead of per row.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_latency: float = Config.GROUP_COMMIT_MAX_LATENCY,
+        batch_size: int = Config.GROUP_COMMIT_BATCH_SIZE
+    ):
+        self.session_factory = session_factory
+        self.max_latency = max_latency
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Tuple[Dict, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, values: Dict) -> Future:
+        """
+        Queue a Transaction insert (column values; user_id None only for
+        the legacy unscoped rows) and return a future for (row, created). A
+        row whose idempotency_key is already stored is not inserted; the
+        future resolves to the stored row instead. Rows are not deduplicated
+        by content: two identical purchases on one day are both real.
+        """
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                    self._thread.start()
+        future: Future = Future()
+        self._queue.put((values, future))
+        return future
+
+    async def insert(self, values: Dict) -> Tuple[Transaction, bool]:
+        return await asyncio.wrap_future(self.submit(values))
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception:
+                # The writer thread must outlive any one batch
+                logger.exception("Group commit batch failed")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Group commit failed"))
+
+    def _write(self, batch: List[Tuple[Dict, Future]]) -> None:
+        # Claimed futures can no longer be cancelled; cancelled ones are skipped
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            committed = [self._commit(batch)]
+        except Exception:
+            # Isolate the failing rows rather than failing the whole batch
+            committed = []
+            for item in batch:
+                try:
+                    committed.append(self._commit([item]))
+                except Exception as e:
+                    item[1].set_exception(e)
+        # Nothing after the commit may send rows back through the retry above
+        for commit in committed:
+            try:
+                self._publish(*commit)
+            except Exception:
+                logger.exception("Publishing a committed batch failed")
+
+    def _commit(self, batch: List[Tuple[Dict, Future]]) -> Tuple:
+        """Insert one batch in one transaction; returns what _publish needs"""
+        db = self.session_factory()
+        db.expire_on_commit = False
+        try:
+            prepared = [prepare_transaction(values) for values, _ in batch]
+            existing = find_existing(db, prepared, by_content=False)
+            # Each caller gets (row, created); retries of a stored row or of
+            # an earlier row in this batch resolve to that row
+            results = []
+            transactions = []
+            for values in prepared:
+                identity = duplicate_identity(values, by_content=False)
+                if identity in existing:
+                    results.append((existing[identity], False))
+                    continue
+                transaction = Transaction(**values)
+                transactions.append(transaction)
+                results.append((transaction, True))
+                if identity is not None:
+                    existing[identity] = transaction
+            db.add_all(transactions)
+            record_transactions(db, (
+                (t.user_id, t.description, t.amount_cents, t.date) for t in transactions
+            ))
+            record_amounts(db, (
+                (t.user_id, t.category or t.predicted_category, t.amount_cents) for t in transactions
+            ))
+            writes: Dict[int, int] = {}
+            for transaction in transactions:
+                # Unscoped legacy rows have no version, series or sketches
+                if transaction.user_id is not None:
+                    writes[transaction.user_id] = writes.get(transaction.user_id, 0) + 1
+            for user_id, count in writes.items():
+                bump_data_version(db, user_id, count)
+            versions = dict(
+                db.query(UserVersion.user_id, UserVersion.data_version)
+                .filter(UserVersion.user_id.in_(list(writes))).all()
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return batch, results, transactions, writes, versions
+
+    def _publish(self, batch, results, transactions, writes, versions) -> None:
+        self.batches += 1
+        self.rows += len(transactions)
+        try:
+            # Replay the versions one write at a time so cached columns stay current
+            for user_id in writes:
+                writes[user_id] = versions.get(user_id, 0) - writes[user_id]
+            for transaction in transactions:
+                if transaction.user_id is None:
+                    continue
+                writes[transaction.user_id] += 1
+                columnar_cache.append(transaction.user_id, transaction, writes[transaction.user_id])
+        finally:
+            for result, (_, future) in zip(results, batch):
+                if not future.done():
+                    future.set_result(result)
+
+
+transaction_writer = GroupCommitWriter()
+
+_shard_writers: Dict[int, GroupCommitWriter] = {}
+_shard_writers_lock = threading.Lock()
+
+
+def writer_for_user(user_id: Optional[int]) -> GroupCommitWriter:
+    """
+    The writer for a user's transactions: one per shard when sharding is
+    on, so shards commit in parallel. Rows with no user go to the main
+    database, like session_for_user(None).
+    """
+    if shard_router is None or user_id is None:
+        return transaction_writer
+    shard = shard_router.shard_for(user_id)
+    with _shard_writers_lock:
+        writer = _shard_writers.get(shard)
+        if writer is None:
+            writer = _shard_writers[shard] = GroupCommitWriter(
+                session_factory=lambda: shard_router.session_for_shard(shard)
+            )
+        return writer
+
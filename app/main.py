@@ -1,37 +1,66 @@
 from fastapi import FastAPI, Depends, HTTPException, Request, Form
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from typing import List, Dict
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from app.database import SessionLocal, engine
 from models.transaction import Base, Transaction
 from services.transaction_service import TransactionService
 from services.ai_service import AIService
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, RedirectResponse, JSONResponse
+from services.llm_client import llm_metrics
+from services.spending_summary import summarize_spending
+from services.budget_engine import average_monthly_spend
+from fastapi.responses import FileResponse, RedirectResponse, JSONResponse, StreamingResponse
 from app.utils import (
+    to_cents,
     format_currency,
+    format_cents,
+    from_cents,
     calculate_monthly_summary,
     calculate_category_percentages,
     validate_transaction_amount,
     get_date_range_filter,
-    generate_transaction_summary
+    generate_transaction_summary,
+    get_period_start
 )
 from pydantic import BaseModel, Field
 from typing import Optional
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from authlib.integrations.starlette_client import OAuth
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 import os
 import logging
 from dotenv import load_dotenv
 import random  # For demo data, replace with real data later
 from .models.database import get_db, User, Transaction
+from .cache import GZIP_MINIMUM_SIZE, cached_json_response
+from .assets import PrecompressedStaticFiles, page_store
+from .events import event_broker
+from .search import search_transactions
+from .columnar import columnar_cache
+from .reports import get_report, report_scheduler
+from .admission import llm_admission
+from .group_commit import writer_for_user
+from .shards import session_for_user
+from .archive import archive_sessions, include_archives
+from .backfill import ensure_backfilled
+from .migrations import move_rows_to_shards
+from .serialization import json_response, fetch_dicts, select_transactions
+from .dedup import bulk_insert_transactions
+from .analytics import time_series
+from .recurring import recurring_charges
+from .sketches import amount_quantiles
+from .services.transaction_service import TransactionService as UserTransactionService, DASHBOARD_FIELDS
 from passlib.context import CryptContext
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
 import secrets
 import re
+import numpy as np
 
 load_dotenv()
 
@@ -42,6 +71,22 @@ app = FastAPI(title="AI-Powered Finance Tracker")
 # Initialize AI Service
 ai_service = AIService()
 
+@app.on_event("startup")
+def move_main_rows_to_shards():
+    # Before any request reads a shard: rows an unsharded deployment left in
+    # the main database would otherwise be invisible to their users
+    moved = move_rows_to_shards()
+    if moved:
+        logger.info("Moved %d transactions from the main database to their shards", moved)
+
+@app.on_event("startup")
+def start_report_scheduler():
+    report_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_report_scheduler():
+    report_scheduler.stop()
+
 # OAuth setup
 oauth = OAuth()
 oauth.register(
@@ -78,6 +123,10 @@ app.add_middleware(
     https_only=False  # Set to True if using HTTPS
 )
 
+# Compress other large responses; cached JSON responses and pre-compressed
+# static files arrive already encoded and pass through untouched
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
 # Add logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -118,8 +167,9 @@ class UserCreate(BaseModel):
     email: str
     password: str
 
-def get_db():
-    db = SessionLocal()
+def get_db(request: Request):
+    # The signed-in user's transactions may live on their own shard
+    db = session_for_user(session_user_id(request))
     try:
         yield db
     finally:
@@ -127,7 +177,8 @@ def get_db():
 
 # Original endpoints with enhanced validation
 @app.post("/transactions/", response_model=TransactionResponse)
-def create_transaction(
+async def create_transaction(
+    request: Request,
     transaction: TransactionCreate,
     db: Session = Depends(get_db)
 ):
@@ -137,9 +188,11 @@ def create_transaction(
         raise HTTPException(status_code=400, detail=error_message)
     
     service = TransactionService(db)
-    new_transaction = service.create_transaction(
+    new_transaction = await service.create_transaction(
         amount=transaction.amount,
-        description=transaction.description
+        description=transaction.description,
+        user_id=session_user_id(request),
+        user_key=request_key(request)
     )
     
     return new_transaction
@@ -150,101 +203,95 @@ def get_transactions(
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    service = TransactionService(db)
-    return service.get_transactions(skip=skip, limit=limit)
+    # Already matches TransactionResponse; returning a Response skips per-row validation
+    return json_response(fetch_dicts(db, select_transactions(
+        "id", "amount", "description", "predicted_category", "confidence_score", "date"
+    ).offset(skip).limit(limit)))
 
 @app.get("/analysis/")
 def get_spending_analysis(db: Session = Depends(get_db)):
     service = TransactionService(db)
     transactions = service.get_transactions()
     
-    # Get category totals
+    # Get category totals in cents
     category_totals = service.get_spending_analysis()
     
     # Calculate percentages
     category_percentages = calculate_category_percentages(category_totals)
     
-    # Get monthly summary
+    # Get monthly summary in cents
     monthly_summary = calculate_monthly_summary([
         {
-            "amount": t.amount,
+            "amount": t.amount_cents,
             "date": t.date,
             "category": t.predicted_category
         } for t in transactions
     ])
 
     return {
-        "category_totals": {k: format_currency(v) for k, v in category_totals.items()},
+        "category_totals": {k: format_cents(v) for k, v in category_totals.items()},
         "category_percentages": {k: f"{v:.1f}%" for k, v in category_percentages.items()},
-        "monthly_summary": {k: format_currency(v) for k, v in monthly_summary.items()}
+        "monthly_summary": {k: format_cents(v) for k, v in monthly_summary.items()}
     }
 
+def session_user_id(request: Request) -> Optional[int]:
+    """The signed-in user's id, or None for the legacy unscoped view of all transactions"""
+    user = request.session.get('user')
+    return user['id'] if user else None
+
+def request_key(request: Request):
+    """Who to rate-limit: the signed-in user, else the client address"""
+    user_id = session_user_id(request)
+    if user_id is not None:
+        return user_id
+    return request.client.host if request.client else None
+
 # New AI-powered endpoints
 @app.get("/insights/")
-def get_ai_insights(db: Session = Depends(get_db)):
+def get_ai_insights(request: Request, db: Session = Depends(get_db)):
     """Get AI-powered insights about spending patterns"""
-    service = TransactionService(db)
-    transactions = service.get_transactions()
-    
-    # Convert SQLAlchemy objects to dictionaries
-    transaction_dicts = [
-        {
-            "amount": t.amount,
-            "predicted_category": t.predicted_category,
-            "description": t.description,
-            "date": t.date
-        } for t in transactions
-    ]
-    
-    insights = ai_service.get_spending_insights(transaction_dicts)
+    user_id = session_user_id(request)
+    if user_id is not None:
+        report = get_report(db, user_id, with_insights=True, user_key=user_id)
+        # Stale insights beat none when the LLM call was shed or failed
+        insights = report['insights'] or report.get('previous_insights')
+        return {"insights": insights or "Unable to generate insights at this time."}
+    summary = summarize_spending(db, user_id)
+    
+    insights = ai_service.get_spending_insights(summary, request_key(request))
     return {"insights": insights}
 
 @app.get("/anomalies/")
-def detect_anomalies(db: Session = Depends(get_db)):
+def detect_anomalies(request: Request, db: Session = Depends(get_db)):
     """Detect unusual spending patterns"""
-    service = TransactionService(db)
-    transactions = service.get_transactions()
+    user_id = session_user_id(request)
+    if user_id is not None:
+        return {"anomalies": get_report(db, user_id)['anomalies']}
+    transactions = columnar_cache.get(db, user_id)
     
-    transaction_dicts = [
-        {
-            "amount": t.amount,
-            "predicted_category": t.predicted_category,
-            "description": t.description,
-            "date": t.date
-        } for t in transactions
-    ]
-    
-    anomalies = ai_service.detect_anomalies(transaction_dicts)
+    anomalies = ai_service.detect_anomalies(transactions)
     return {"anomalies": anomalies}
 
 @app.post("/budget-suggestion/")
-def suggest_budget(income: float, db: Session = Depends(get_db)):
+def suggest_budget(request: Request, income: float, db: Session = Depends(get_db)):
     """Get AI-powered budget suggestions"""
     if income <= 0:
         raise HTTPException(status_code=400, detail="Income must be greater than 0")
     
-    service = TransactionService(db)
-    transactions = service.get_transactions()
-    
-    transaction_dicts = [
-        {
-            "amount": t.amount,
-            "predicted_category": t.predicted_category,
-            "description": t.description,
-            "date": t.date
-        } for t in transactions
-    ]
+    category_spending = average_monthly_spend(db, session_user_id(request))
     
-    budget = ai_service.suggest_budget(transaction_dicts, income)
+    # Never waits on the LLM; refinements are admitted in the background
+    budget, source = ai_service.suggest_budget(category_spending, income)
     return {
         "suggested_budget": {
             category: format_currency(amount)
             for category, amount in budget.items()
-        }
+        },
+        "source": source
     }
 
 @app.get("/future-expenses/")
-def predict_expenses(months_ahead: int = 1, db: Session = Depends(get_db)):
+def predict_expenses(request: Request, months_ahead: int = 1, db: Session = Depends(get_db)):
     """Predict future expenses"""
     if months_ahead < 1 or months_ahead > 12:
         raise HTTPException(
@@ -252,19 +299,12 @@ def predict_expenses(months_ahead: int = 1, db: Session = Depends(get_db)):
             detail="Months ahead must be between 1 and 12"
         )
     
-    service = TransactionService(db)
-    transactions = service.get_transactions()
-    
-    transaction_dicts = [
-        {
-            "amount": t.amount,
-            "predicted_category": t.predicted_category,
-            "description": t.description,
-            "date": t.date
-        } for t in transactions
-    ]
-    
-    predictions = ai_service.predict_future_expenses(transaction_dicts, months_ahead)
+    user_id = session_user_id(request)
+    if user_id is not None and months_ahead == 1:
+        predictions = get_report(db, user_id)['predicted_expenses']
+    else:
+        transactions = columnar_cache.get(db, user_id)
+        predictions = ai_service.predict_future_expenses(transactions, months_ahead)
     return {
         "predicted_expenses": {
             category: format_currency(amount)
@@ -272,8 +312,18 @@ def predict_expenses(months_ahead: int = 1, db: Session = Depends(get_db)):
         }
     }
 
+@app.get("/metrics/llm")
+def get_llm_metrics():
+    """Counts of executed, coalesced (saved) and failed LLM calls"""
+    return llm_metrics()
+
+@app.get("/metrics/admission")
+async def get_admission_metrics():
+    """Concurrency limits, in-flight and shed counts of the LLM-backed routes, and the circuit state"""
+    return llm_admission.metrics()
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="app/static"), name="static")
 
 # Auth routes
 @app.get("/")
@@ -281,11 +331,11 @@ async def root(request: Request):
     user = request.session.get('user')
     if not user:
         return RedirectResponse(url="/login")
-    return FileResponse("app/static/index.html")
+    return page_store.response(request, "index.html")
 
 @app.get("/login")
-async def login_page():
-    return FileResponse("app/static/login.html")
+async def login_page(request: Request):
+    return page_store.response(request, "login.html")
 
 @app.get('/auth/google/login')
 async def google_login(request: Request):
@@ -375,49 +425,60 @@ async def get_user(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user
 
+def compute_quick_stats(db: Session, user_id: int) -> Dict:
+    total_cents, largest_cents, transaction_count = UserTransactionService.get_totals(db, user_id)
+    
+    return {
+        "total_spending": from_cents(total_cents),
+        "monthly_average": from_cents(round(total_cents / 30)),
+        "largest_expense": from_cents(largest_cents),
+        "transaction_count": transaction_count
+    }
+
 @app.get("/api/quick-stats")
 async def get_quick_stats(request: Request, db: Session = Depends(get_db)):
     user = request.session.get('user')
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    transactions = db.query(Transaction).filter(Transaction.user_id == user['id']).all()
-    
-    total_spending = sum(t.amount for t in transactions) if transactions else 0
-    largest_expense = max((t.amount for t in transactions), default=0)
-    transaction_count = len(transactions)
-    monthly_average = total_spending / 30 if transactions else 0
-    
-    return {
-        "total_spending": round(total_spending, 2),
-        "monthly_average": round(monthly_average, 2),
-        "largest_expense": round(largest_expense, 2),
-        "transaction_count": transaction_count
-    }
+    return await cached_json_response(
+        request, db, user['id'], "quick-stats", (),
+        lambda: compute_quick_stats(db, user['id'])
+    )
 
 @app.get("/api/transactions")
-async def get_transactions(request: Request, db: Session = Depends(get_db)):
+async def get_transactions(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """The user's transactions, newest first, including the archived years the range covers"""
     user = request.session.get('user')
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    transactions = db.query(Transaction)\
-        .filter(Transaction.user_id == user['id'])\
-        .order_by(Transaction.date.desc())\
-        .all()
-    
-    return [
-        {
-            "id": t.id,
-            "amount": t.amount,
-            "description": t.description,
-            "category": t.category,
-            "date": t.date.isoformat(),
-            "predicted_category": t.predicted_category or "",
-            "confidence_score": t.confidence_score or 0.0
-        }
-        for t in transactions
-    ]
+    def compute():
+        statement = select_transactions(
+            "id", "amount", "description", "category", "date",
+            "predicted_category", "confidence_score"
+        ).where(Transaction.user_id == user['id'])
+        if start is not None:
+            statement = statement.where(Transaction.date >= datetime.combine(start, datetime.min.time()))
+        if end is not None:
+            statement = statement.where(Transaction.date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        statement = statement.order_by(Transaction.date.desc())
+        with archive_sessions(db, start, end) as archived:
+            rows = fetch_dicts(db, statement)
+            if not archived:
+                return rows
+            for source in archived:
+                rows += fetch_dicts(source, statement)
+        # Backdated rows can sit in the hot table next to archived ones
+        return sorted(rows, key=lambda row: row["date"] or datetime.min, reverse=True)
+    
+    params = (start and start.isoformat(), end and end.isoformat())
+    return await cached_json_response(request, db, user['id'], "transactions", params, compute)
 
 @app.get("/api/analysis")
 async def get_analysis(request: Request, period: str = 'month', db: Session = Depends(get_db)):
@@ -426,50 +487,189 @@ async def get_analysis(request: Request, period: str = 'month', db: Session = De
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     # Calculate date range based on period
-    now = datetime.now()
-    if period == 'week':
-        start_date = now - timedelta(days=7)
-    elif period == 'month':
-        start_date = now - timedelta(days=30)
-    elif period == 'year':
-        start_date = now - timedelta(days=365)
-    else:
-        start_date = now - timedelta(days=30)  # default to month
-    
-    # Get transactions for the period
-    transactions = db.query(Transaction)\
-        .filter(Transaction.user_id == user['id'])\
-        .filter(Transaction.date >= start_date)\
-        .order_by(Transaction.date.asc())\
-        .all()
-    
-    # Initialize data structures
-    daily_spending = {}
-    category_totals = {}
-    
-    # Generate all dates in the range for complete data
-    date_range = []
-    delta = now - start_date
-    for i in range(delta.days + 1):
-        date = (start_date + timedelta(days=i)).strftime('%Y-%m-%d')
-        daily_spending[date] = 0
-        date_range.append(date)
-    
-    # Process transactions
-    for t in transactions:
-        date_str = t.date.strftime('%Y-%m-%d')
-        daily_spending[date_str] = daily_spending.get(date_str, 0) + abs(t.amount)
+    now = datetime.utcnow()
+    start_date = get_period_start(period, now)
+    
+    def compute():
+        columns = columnar_cache.get(db, user['id'])
+        
+        # Generate all dates in the range for complete data
+        start_day = np.datetime64(start_date.date(), 'D')
+        day_count = (now - start_date).days + 1
+        date_range = [str(day) for day in np.arange(start_day, start_day + day_count)]
+        
+        # Bucket the period's transactions by day and category (summed in cents)
+        in_period = columns.timestamps >= np.datetime64(start_date, 'us')
+        amount_cents = np.abs(columns.amount_cents[in_period])
+        day_offsets = (columns.timestamps[in_period].astype('datetime64[D]') - start_day).astype(np.int64)
+        in_range = day_offsets < day_count
+        daily_spending = np.bincount(
+            day_offsets[in_range], weights=amount_cents[in_range], minlength=day_count
+        )
+        
+        codes = columns.category_codes[in_period]
+        category_cents = np.bincount(codes, weights=amount_cents, minlength=len(columns.categories))
+        category_totals = {}
+        for code in np.unique(codes):
+            category = columns.categories[code] or 'Other'
+            category_totals[category] = category_totals.get(category, 0) + int(category_cents[code])
         
-        category = t.category or 'Other'
-        category_totals[category] = category_totals.get(category, 0) + abs(t.amount)
+        return {
+            "spending_trends": {
+                "dates": date_range,
+                "amounts": [from_cents(int(cents)) for cents in daily_spending]
+            },
+            "category_totals": {k: from_cents(v) for k, v in category_totals.items()}
+        }
     
-    return {
-        "spending_trends": {
-            "dates": date_range,
-            "amounts": [daily_spending[date] for date in date_range]
-        },
-        "category_totals": category_totals
-    }
+    # The window slides daily, so today's date is part of the cache key
+    params = (period, now.strftime('%Y-%m-%d'))
+    return await cached_json_response(request, db, user['id'], "analysis", params, compute)
+
+@app.get("/api/analytics")
+async def get_analytics(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = 'day',
+    tz: str = 'UTC',
+    db: Session = Depends(get_db)
+):
+    """Spending per day, week, month or quarter between two local dates, as parallel arrays"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {tz}")
+    end = end or datetime.now(zone).date()
+    start = start or end - timedelta(days=29)
+    
+    try:
+        # A day either side covers the shift from local dates to stored UTC
+        include_archives(db, start - timedelta(days=1), end + timedelta(days=1))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def compute():
+        try:
+            return time_series(db, user['id'], start, end, granularity, tz)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    params = (start.isoformat(), end.isoformat(), granularity, tz)
+    return await cached_json_response(request, db, user['id'], "analytics", params, compute)
+
+@app.get("/api/recurring")
+async def get_recurring(request: Request, db: Session = Depends(get_db)):
+    """Subscriptions and other recurring charges with their next expected date"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    # Before the cache lookup: a back-fill bumps the data version
+    ensure_backfilled(db, user['id'], "recurring")
+    # Lapsed/active depends on today, so the date is part of the cache key
+    now = datetime.utcnow()
+    return await cached_json_response(
+        request, db, user['id'], "recurring", (now.strftime('%Y-%m-%d'),),
+        lambda: recurring_charges(db, user['id'], now)
+    )
+
+@app.get("/api/quantiles")
+async def get_quantiles(
+    request: Request,
+    q: str = '0.5,0.9,0.95,0.99',
+    category: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Approximate spending percentiles, overall or for one category, in constant time"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    try:
+        quantiles = [float(value) for value in q.split(',') if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers")
+    if not quantiles or any(not 0 <= value <= 1 for value in quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    
+    ensure_backfilled(db, user['id'], "sketches")
+    return await cached_json_response(
+        request, db, user['id'], "quantiles", (tuple(quantiles), category),
+        lambda: amount_quantiles(db, user['id'], quantiles, category)
+    )
+
+@app.get("/api/transactions/search")
+async def search_user_transactions(
+    request: Request,
+    q: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    """Full-text search over transaction descriptions and categories"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 100")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Offset must not be negative")
+    
+    with archive_sessions(db, start_date and start_date.date(), end_date and end_date.date()) as archived:
+        return search_transactions(
+            db, user['id'], q,
+            start_date=start_date,
+            end_date=end_date,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            limit=limit,
+            offset=offset,
+            archives=archived
+        )
+
+@app.get("/api/dashboard")
+async def get_dashboard(
+    request: Request,
+    period: str = 'month',
+    limit: int = 10,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Stats, trends, category totals and recent transactions in one round trip"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="Limit must be between 1 and 100")
+    
+    selected = DASHBOARD_FIELDS
+    if fields:
+        selected = tuple(f.strip() for f in fields.split(',') if f.strip())
+        unknown = [f for f in selected if f not in DASHBOARD_FIELDS + ('user',)]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    
+    def compute():
+        dashboard = UserTransactionService.get_dashboard(
+            db, user['id'], period=period, recent_limit=limit, fields=selected
+        )
+        if not fields or 'user' in selected:
+            dashboard['user'] = user
+        return dashboard
+    
+    params = (period, limit, selected, datetime.utcnow().strftime('%Y-%m-%d'))
+    return await cached_json_response(request, db, user['id'], "dashboard", params, compute)
 
 # Add this endpoint for debugging
 @app.get("/api/debug/transactions")
@@ -479,18 +679,9 @@ async def debug_transactions(request: Request, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    transactions = db.query(Transaction)\
-        .filter(Transaction.user_id == user['id'])\
-        .order_by(Transaction.date.desc())\
-        .all()
-    
-    return [{
-        "id": t.id,
-        "amount": t.amount,
-        "description": t.description,
-        "category": t.category,
-        "date": t.date.isoformat()
-    } for t in transactions]
+    return json_response(fetch_dicts(db, select_transactions(
+        "id", "amount", "description", "category", "date"
+    ).where(Transaction.user_id == user['id']).order_by(Transaction.date.desc())))
 
 @app.post("/api/transactions")
 async def create_transaction(
@@ -502,24 +693,115 @@ async def create_transaction(
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    new_transaction = Transaction(
-        user_id=user['id'],
-        amount=transaction['amount'],
-        description=transaction['description'],
-        category=transaction['category'],
-        date=datetime.now()
-    )
-    
-    db.add(new_transaction)
-    db.commit()
-    db.refresh(new_transaction)
+    # Rejected here rather than failing a shared batch in the writer
+    try:
+        amount_cents = to_cents(transaction['amount'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid transaction: {e}")
     
-    return {"status": "success", "transaction": {
+    # Committed together with concurrent inserts; see GroupCommitWriter.
+    # A retry with the same Idempotency-Key returns the stored row instead of
+    # a new one.
+    try:
+        new_transaction, is_new = await writer_for_user(user['id']).insert({
+            "user_id": user['id'],
+            "amount_cents": amount_cents,
+            "description": transaction['description'],
+            "category": transaction['category'],
+            "date": datetime.utcnow(),
+            "idempotency_key": request.headers.get('idempotency-key')
+        })
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Idempotency-Key is already in use")
+    
+    created = {
+        "id": new_transaction.id,
         "amount": new_transaction.amount,
         "description": new_transaction.description,
         "category": new_transaction.category,
         "date": new_transaction.date.isoformat()
-    }}
+    }
+    if not is_new:
+        return {"status": "duplicate", "transaction": created}
+    publish_transaction_events(db, user['id'], created)
+    
+    return {"status": "success", "transaction": created}
+
+@app.post("/api/transactions/import")
+async def import_transactions(
+    request: Request,
+    transactions: List[dict],
+    db: Session = Depends(get_db)
+):
+    """Bulk load (e.g. a bank statement), skipping rows that are already stored"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    try:
+        rows = [
+            {
+                "amount_cents": to_cents(t['amount']),
+                "description": t['description'],
+                "category": t.get('category'),
+                "date": datetime.fromisoformat(t['date']) if t.get('date') else datetime.utcnow(),
+                "idempotency_key": t.get('idempotency_key')
+            }
+            for t in transactions
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid transaction: {e}")
+    
+    try:
+        result = bulk_insert_transactions(db, user['id'], rows)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="An idempotency_key is already in use")
+    if result['inserted']:
+        event_broker.publish(user['id'], "resync", {})
+    return {"status": "success", **result}
+
+def publish_transaction_events(db: Session, user_id: int, transaction: Dict):
+    """Push incremental updates for a new transaction to the user's live dashboards"""
+    if not event_broker.has_subscribers(user_id):
+        return
+    
+    event_broker.publish(user_id, "transaction", transaction)
+    event_broker.publish(user_id, "quick_stats", compute_quick_stats(db, user_id))
+    
+    # Flag the transaction if it is more than 2 standard deviations from the
+    # mean of the user's earlier transactions in the same category
+    count, mean_amount, mean_square = db.query(
+        func.count(Transaction.id),
+        func.avg(Transaction.amount),
+        func.avg(Transaction.amount * Transaction.amount)
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.category == transaction['category'],
+        Transaction.id != transaction['id']
+    ).one()
+    if count and count >= 2:
+        variance = max(0.0, mean_square - mean_amount ** 2) * count / (count - 1)
+        if variance > 0:
+            z_score = abs(transaction['amount'] - mean_amount) / variance ** 0.5
+            if z_score > 2:
+                event_broker.publish(user_id, "anomaly", {
+                    "transaction": transaction,
+                    "reason": f"Amount is unusually {'high' if transaction['amount'] > mean_amount else 'low'} for this category",
+                    "severity": "high" if z_score > 3 else "medium"
+                })
+
+@app.get("/api/events")
+async def dashboard_events(request: Request):
+    """Server-sent event stream of live dashboard updates"""
+    user = request.session.get('user')
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return StreamingResponse(
+        event_broker.stream(request, user['id']),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # Add this test endpoint to verify session
 @app.get('/test-session')
@@ -530,8 +812,8 @@ async def test_session(request: Request):
     }
 
 @app.get("/signup")
-async def signup_page():
-    return FileResponse("app/static/signup.html")
+async def signup_page(request: Request):
+    return page_store.response(request, "signup.html")
 
 def validate_password(password: str) -> tuple[bool, str]:
     """Validate password strength"""
@@ -629,20 +911,20 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to create user: {str(e)}")
 
 @app.get("/verify-email")
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(request: Request, token: str, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.verification_token == token).first()
     
     if not user:
         raise HTTPException(status_code=400, detail="Invalid verification token")
     
     if user.is_verified:
-        return FileResponse("app/static/login.html")
+        return page_store.response(request, "login.html")
     
     user.is_verified = True
     user.verification_token = None
     db.commit()
     
-    return FileResponse("app/static/login.html")
+    return page_store.response(request, "login.html")
 
 @app.post("/auth/login")
 async def login(
@@ -0,0 +1,183 @@
+from typing import Dict, List
+
+from sqlalchemy import DateTime, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+from .database import engine
+from .utils import to_cents, dedup_key
+
+BATCH_SIZE = 10000
+
+
+def migrate_amounts_to_cents(engine: Engine = engine) -> int:
+    """
+    Convert the legacy Float `amount` column of transactions to integer
+    `amount_cents`. Safe to run more than once; returns the rows converted.
+    """
+    inspector = inspect(engine)
+    if 'transactions' not in inspector.get_table_names():
+        return 0
+    columns = {column['name'] for column in inspector.get_columns('transactions')}
+    if 'amount' not in columns or 'amount_cents' in columns:
+        return 0
+
+    converted = 0
+    with engine.begin() as conn:
+        conn.execute(text(
+            "ALTER TABLE transactions ADD COLUMN amount_cents INTEGER NOT NULL DEFAULT 0"
+        ))
+        # Round in Python with the same half-up rule as format_currency rather
+        # than trusting SQL ROUND on binary floats
+        rows = conn.execute(text(
+            "SELECT id, amount FROM transactions WHERE amount IS NOT NULL"
+        )).all()
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = [
+                {"id": row.id, "cents": to_cents(row.amount)}
+                for row in rows[start:start + BATCH_SIZE]
+            ]
+            conn.execute(
+                text("UPDATE transactions SET amount_cents = :cents WHERE id = :id"),
+                batch
+            )
+            converted += len(batch)
+        try:
+            conn.execute(text("ALTER TABLE transactions DROP COLUMN amount"))
+        except OperationalError:
+            # SQLite before 3.35 cannot drop columns; the old column is simply unused
+            pass
+    return converted
+
+
+
+def add_dedup_keys(engine: Engine = engine) -> int:
+    """
+    Add the dedup_key and idempotency_key columns and their indexes to an
+    existing transactions table and back-fill dedup keys. Safe to run more
+    than once; returns the rows back-filled.
+    """
+    inspector = inspect(engine)
+    if 'transactions' not in inspector.get_table_names():
+        return 0
+    columns = {column['name'] for column in inspector.get_columns('transactions')}
+
+    filled = 0
+    with engine.begin() as conn:
+        if 'dedup_key' not in columns:
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN dedup_key VARCHAR(40)"))
+        if 'idempotency_key' not in columns:
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN idempotency_key VARCHAR"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_transactions_user_dedup "
+            "ON transactions (user_id, dedup_key)"
+        ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_transactions_user_idempotency "
+            "ON transactions (user_id, idempotency_key)"
+        ))
+        rows = conn.execute(text(
+            "SELECT id, description, amount_cents, date FROM transactions WHERE dedup_key IS NULL"
+        ).columns(date=DateTime)).all()
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = [
+                {"id": row.id, "key": dedup_key(row.description, row.amount_cents, row.date)}
+                for row in rows[start:start + BATCH_SIZE]
+                if row.date is not None
+            ]
+            if batch:
+                conn.execute(text("UPDATE transactions SET dedup_key = :key WHERE id = :id"), batch)
+            filled += len(batch)
+    return filled
+
+
+# Bound parameters per IN (...) list
+USER_CHUNK = 500
+
+# Per-user rows derived from transactions; rebuilt after a move (app.backfill)
+DERIVED_TABLES = ('recurring_series', 'amount_sketches', 'history_backfills')
+
+
+def _move_user_rows(source: Engine, shard_path: str, user_ids: List[int], columns: str, hot: bool) -> int:
+    """
+    Move the users' transactions from a main database file into a shard's
+    hot table in one transaction, bumping their data versions there and
+    dropping their derived rows on both sides
+    """
+    moved = 0
+    with source.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS shard", (shard_path,))
+        try:
+            for start in range(0, len(user_ids), USER_CHUNK):
+                chunk = tuple(user_ids[start:start + USER_CHUNK])
+                users = f"user_id IN ({', '.join('?' * len(chunk))})"
+                conn.exec_driver_sql(
+                    "INSERT INTO shard.user_versions (user_id, data_version) "
+                    f"SELECT user_id, COUNT(*) FROM main.transactions WHERE {users} GROUP BY user_id "
+                    "ON CONFLICT (user_id) DO UPDATE SET data_version = data_version + excluded.data_version",
+                    chunk
+                )
+                for table in DERIVED_TABLES:
+                    conn.exec_driver_sql(f"DELETE FROM shard.{table} WHERE {users}", chunk)
+                if hot:
+                    for table in DERIVED_TABLES + ('user_versions',):
+                        conn.exec_driver_sql(f"DELETE FROM main.{table} WHERE {users}", chunk)
+                moved += conn.exec_driver_sql(
+                    f"INSERT INTO shard.transactions ({columns}) "
+                    f"SELECT {columns} FROM main.transactions WHERE {users}",
+                    chunk
+                ).rowcount
+                conn.exec_driver_sql(f"DELETE FROM main.transactions WHERE {users}", chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE shard")
+            conn.commit()
+    return moved
+
+
+def move_rows_to_shards() -> int:
+    """
+    With sharding on, move every user's transactions still in the main
+    database or its archive files into their shard (crc32(user_id) %
+    SHARD_COUNT); otherwise they would be orphaned there. Rows with no user
+    stay, as session_for_user(None) reads the main database. Each batch
+    moves in one transaction, so an interrupted run is safe to repeat, and
+    once the main database holds no user rows it is a no-op. Does not
+    rebalance rows between shards when SHARD_COUNT changes. Returns the
+    rows moved.
+    """
+    # Imported here: app.models.database recreates the schema on import,
+    # which the column migrations above must not trigger
+    from .archive import archive_paths, open_archive
+    from .models.database import Transaction
+    from .shards import shard_router
+    if shard_router is None:
+        return 0
+
+    # Ids are the shard's to assign: archival relies on them never being
+    # reused, so archived rows land in the hot table and are re-archived
+    # by the next run_archival
+    columns = ", ".join(column.name for column in Transaction.__table__.columns if column.name != 'id')
+    main_engine = shard_router.main_engine
+    sources = [(main_engine, True)] + [(open_archive(path), False) for path in archive_paths(main_engine).values()]
+    moved = 0
+    for source, hot in sources:
+        with source.connect() as conn:
+            user_ids = [user_id for (user_id,) in conn.exec_driver_sql(
+                "SELECT DISTINCT user_id FROM transactions WHERE user_id IS NOT NULL"
+            )]
+        by_shard: Dict[int, List[int]] = {}
+        for user_id in user_ids:
+            by_shard.setdefault(shard_router.shard_for(user_id), []).append(user_id)
+        for shard, shard_user_ids in by_shard.items():
+            shard_path = shard_router.engine(shard).url.database
+            moved += _move_user_rows(source, shard_path, shard_user_ids, columns, hot)
+    return moved
+
+
+if __name__ == "__main__":
+    print(f"Converted {migrate_amounts_to_cents()} transaction amounts to cents")
+    print(f"Back-filled {add_dedup_keys()} transaction dedup keys")
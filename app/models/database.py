@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, ForeignKey, Boolean, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 import os
+from ..search import ensure_search_index, drop_search_index
+from ..utils import to_cents, from_cents
 
 # Create the database engine
 DATABASE_URL = "sqlite:///./finance_tracker.db"
@@ -28,25 +31,101 @@ class User(Base):
     last_login = Column(DateTime, nullable=True)
     transactions = relationship("Transaction", back_populates="user")
 
+class UserVersion(Base):
+    __tablename__ = "user_versions"
+
+    # Lives next to the user's transactions (their shard), so a write and
+    # its version bump commit together under one lock
+    user_id = Column(Integer, primary_key=True)
+    data_version = Column(Integer, nullable=False, default=0)  # Bumped on every write to this user's data
+
+class HistoryBackfill(Base):
+    __tablename__ = "history_backfills"
+
+    # Marks a per-user index (see app.backfill) as rebuilt from the user's
+    # history; shard-local like UserVersion
+    user_id = Column(Integer, primary_key=True)
+    name = Column(String, primary_key=True)
+    backfilled_at = Column(DateTime, default=datetime.utcnow)
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    amount = Column(Float)
+    amount_cents = Column(Integer, nullable=False, default=0)  # Integer minor units, never summed as floats
     description = Column(String)
     category = Column(String)
     date = Column(DateTime, default=datetime.utcnow)
     predicted_category = Column(String, nullable=True)
     confidence_score = Column(Float, nullable=True)
+    dedup_key = Column(String(40), nullable=True)  # See app.dedup.dedup_key
+    idempotency_key = Column(String, nullable=True)  # Client-supplied, unique per user
     
     user = relationship("User", back_populates="transactions")
 
+    @hybrid_property
+    def amount(self):
+        return from_cents(self.amount_cents) if self.amount_cents is not None else None
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100.0
+
+    __table_args__ = (
+        # Every dashboard query filters by user and scans or sorts by date
+        Index('ix_transactions_user_date', 'user_id', 'date'),
+        # O(1) duplicate checks on insert and import
+        Index('ix_transactions_user_dedup', 'user_id', 'dedup_key'),
+        Index('ix_transactions_user_idempotency', 'user_id', 'idempotency_key', unique=True),
+    )
+
+class AIReport(Base):
+    __tablename__ = "ai_reports"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    data_version = Column(Integer, nullable=False)  # UserVersion.data_version the report was computed from
+    payload = Column(Text, nullable=False)  # JSON: insights, anomalies, predicted_expenses
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class RecurringSeries(Base):
+    __tablename__ = "recurring_series"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    merchant = Column(String, nullable=False)  # See app.recurring.merchant_key
+    amount_band = Column(Integer, nullable=False)  # See app.recurring.amount_band
+    description = Column(String)  # Latest charge's description, for display
+    amount_cents = Column(Integer, nullable=False)  # Latest charge
+    occurrences = Column(Integer, nullable=False, default=1)
+    first_date = Column(DateTime, nullable=False)
+    last_date = Column(DateTime, nullable=False)
+    interval_days = Column(Float, nullable=True)  # Smoothed days between charges
+    interval_deviation = Column(Float, nullable=True)  # Smoothed absolute error of interval_days
+
+    __table_args__ = (
+        Index('ix_recurring_series_user_merchant', 'user_id', 'merchant', 'amount_band'),
+    )
+
+class AmountSketch(Base):
+    __tablename__ = "amount_sketches"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)  # '*' for all categories
+    count = Column(Integer, nullable=False, default=0)
+    payload = Column(Text, nullable=False)  # JSON: see app.sketches.QuantileSketch
+
 # Drop all tables first (this will delete existing data)
+drop_search_index(engine)
 Base.metadata.drop_all(bind=engine)
 
 # Create all tables
 Base.metadata.create_all(bind=engine)
+ensure_search_index(engine)
 
 # Dependency
 def get_db():
@@ -0,0 +1,194 @@
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .archive import archive_sessions
+from .models.database import RecurringSeries, Transaction
+from .utils import from_cents, normalize_description
+
+# Charges within this relative distance of a series' last amount join it
+AMOUNT_TOLERANCE = 0.15
+# Width of one amount band on a log scale (10%), so a band and its
+# neighbours cover every amount within the tolerance
+BAND_WIDTH = math.log(1.1)
+# Weight of the newest interval in the smoothed estimate
+SMOOTHING = 0.25
+
+MIN_OCCURRENCES = 3
+MIN_INTERVAL_DAYS = 6
+# Allowed smoothed jitter: this share of the interval, but never under two days
+MAX_RELATIVE_DEVIATION = 0.2
+
+CADENCES = (
+    ('weekly', 7),
+    ('biweekly', 14),
+    ('monthly', 30.44),
+    ('quarterly', 91.31),
+    ('yearly', 365.25),
+)
+
+
+def merchant_key(description: Optional[str]) -> str:
+    """
+    Normalized description with reference numbers and other tokens
+    containing digits dropped, so "NETFLIX.COM 84213" and "Netflix.com 90411"
+    are one merchant
+    """
+    normalized = normalize_description(description)
+    words = [word for word in normalized.split() if not any(ch.isdigit() for ch in word)]
+    return " ".join(words) or normalized
+
+
+def amount_band(amount_cents: int) -> int:
+    return round(math.log(max(abs(amount_cents), 1)) / BAND_WIDTH)
+
+
+def _matches(series: RecurringSeries, amount_cents: int) -> bool:
+    last = abs(series.amount_cents)
+    return abs(abs(amount_cents) - last) <= AMOUNT_TOLERANCE * max(last, abs(amount_cents))
+
+
+def _observe(series: RecurringSeries, amount_cents: int, description: str, date: datetime) -> None:
+    if date.date() in (series.first_date.date(), series.last_date.date()):
+        return  # A same-day repeat is not another period
+    if date > series.last_date:
+        interval = date - series.last_date
+        series.last_date = date
+        series.amount_cents = amount_cents
+        series.description = description
+    elif date < series.first_date:
+        interval = series.first_date - date
+        series.first_date = date
+    else:
+        # Back-filled charge inside the known span: counts, but says nothing
+        # reliable about the interval
+        series.occurrences += 1
+        return
+    series.occurrences += 1
+
+    days = interval.total_seconds() / 86400
+    if series.interval_days is None:
+        series.interval_days = days
+        series.interval_deviation = 0.0
+    else:
+        error = days - series.interval_days
+        series.interval_days += SMOOTHING * error
+        series.interval_deviation += SMOOTHING * (abs(error) - series.interval_deviation)
+
+
+def record_transactions(db: Session, rows: Iterable[Tuple[int, Optional[str], int, datetime]]) -> None:
+    """
+    Fold new (user_id, description, amount_cents, date) rows into their
+    users' recurring series. Each row costs one indexed lookup of its
+    merchant's series (shared by rows of the same merchant) and an O(1)
+    update; history is never read. Call inside the transaction that
+    inserts the rows.
+    """
+    by_merchant: Dict[Tuple[int, str], List[Tuple[Optional[str], int, datetime]]] = {}
+    for user_id, description, amount_cents, date in rows:
+        if user_id is None or date is None or not amount_cents:
+            continue
+        by_merchant.setdefault((user_id, merchant_key(description)), []).append(
+            (description, amount_cents, date)
+        )
+
+    for (user_id, merchant), charges in by_merchant.items():
+        candidates = db.query(RecurringSeries)\
+            .filter(RecurringSeries.user_id == user_id, RecurringSeries.merchant == merchant).all()
+        for description, amount_cents, date in sorted(charges, key=lambda charge: charge[2]):
+            band = amount_band(amount_cents)
+            matching = [
+                series for series in candidates
+                if abs(series.amount_band - band) <= 1 and _matches(series, amount_cents)
+            ]
+            if matching:
+                series = min(matching, key=lambda s: abs(abs(s.amount_cents) - abs(amount_cents)))
+                _observe(series, amount_cents, description, date)
+                series.amount_band = amount_band(series.amount_cents)
+                continue
+            series = RecurringSeries(
+                user_id=user_id,
+                merchant=merchant,
+                amount_band=band,
+                description=description,
+                amount_cents=amount_cents,
+                occurrences=1,
+                first_date=date,
+                last_date=date
+            )
+            db.add(series)
+            candidates.append(series)
+
+
+def cadence(interval_days: float) -> str:
+    for name, days in CADENCES:
+        if abs(interval_days - days) <= 0.2 * days:
+            return name
+    return f"every {round(interval_days)} days"
+
+
+def is_recurring(series: RecurringSeries) -> bool:
+    return (
+        series.occurrences >= MIN_OCCURRENCES
+        and series.interval_days is not None
+        and series.interval_days >= MIN_INTERVAL_DAYS
+        and series.interval_deviation <= max(2.0, MAX_RELATIVE_DEVIATION * series.interval_days)
+    )
+
+
+def next_expected(series: RecurringSeries) -> datetime:
+    return series.last_date + timedelta(days=series.interval_days)
+
+
+def recurring_charges(db: Session, user_id: int, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    A user's subscriptions and other recurring charges with their cadence
+    and next expected charge, soonest first. 'lapsed' marks a series whose
+    expected charge is more than one interval (plus jitter) overdue.
+    Reads only the user's series, never their transactions.
+    """
+    now = now or datetime.utcnow()
+    charges = []
+    for series in db.query(RecurringSeries).filter(
+        RecurringSeries.user_id == user_id,
+        RecurringSeries.occurrences >= MIN_OCCURRENCES
+    ):
+        if not is_recurring(series):
+            continue
+        expected = next_expected(series)
+        overdue = (now - expected).total_seconds() / 86400
+        charges.append({
+            "merchant": series.description,
+            "amount": from_cents(abs(series.amount_cents)),
+            "cadence": cadence(series.interval_days),
+            "interval_days": round(series.interval_days, 1),
+            "occurrences": series.occurrences,
+            "last_charge": series.last_date.isoformat(),
+            "next_expected": expected.date().isoformat(),
+            "status": "lapsed" if overdue > series.interval_days + 2 * series.interval_deviation else "active"
+        })
+    charges.sort(key=lambda charge: charge["next_expected"])
+    return charges
+
+
+def rebuild_series(db: Session, user_id: int) -> int:
+    """
+    One-off back-fill: recompute a user's series from their full history,
+    hot and archived. Inserts keep the series current afterwards. Leaves
+    the commit to the caller (see app.backfill). Returns the series count.
+    """
+    db.query(RecurringSeries).filter(RecurringSeries.user_id == user_id)\
+        .delete(synchronize_session=False)
+    history = []
+    with archive_sessions(db) as archived:
+        for source in (db, *archived):
+            history += source.query(
+                Transaction.description, Transaction.amount_cents, Transaction.date
+            ).filter(Transaction.user_id == user_id).all()
+    record_transactions(db, (
+        (user_id, description, amount_cents, date) for description, amount_cents, date in history
+    ))
+    db.flush()
+    return db.query(RecurringSeries).filter(RecurringSeries.user_id == user_id).count()
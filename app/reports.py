@@ -0,0 +1,225 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .archive import run_archival
+from .backfill import ensure_backfilled
+from .cache import get_data_version
+from .cache_backend import shared_cache
+from .columnar import columnar_cache
+from .config import Config
+from .models.database import AIReport, SessionLocal, Transaction, User
+from .shards import fan_out, session_for_user
+from .sketches import anomaly_fences
+from services.ai_service import AIService
+from services.llm_client import RateLimiter, set_llm_rate_limit
+from services.spending_summary import summarize_spending
+
+logger = logging.getLogger(__name__)
+
+ai_service = AIService()
+
+# Users seen or writing within this window get a nightly report
+ACTIVE_DAYS = 30
+
+
+def compute_report(db: Session, user_id: int, with_insights: bool = True, user_key=None) -> Dict:
+    """
+    Insights, anomalies and next month's forecast for one user, JSON-ready.
+    insights is None when skipped or when the LLM call failed or was shed,
+    so a later request can fill it in.
+    """
+    columns = columnar_cache.get(db, user_id)
+    insights = None
+    if with_insights:
+        summary = summarize_spending(db, user_id)
+        if not summary['transaction_count']:
+            insights = "No transactions available for analysis."
+        else:
+            try:
+                insights = ai_service.generate_insights(summary, user_key)
+            except Exception as e:
+                logger.warning("Insights for user %s failed: %s", user_id, e)
+    return jsonable_encoder({
+        "insights": insights,
+        "anomalies": ai_service.detect_anomalies(columns, anomaly_fences(db, user_id)),
+        "predicted_expenses": ai_service.predict_future_expenses(columns, 1)
+    })
+
+
+def _store_report(db: Session, user_id: int, version: int, payload: Dict) -> None:
+    # One upsert, so the nightly pass and a request-time miss can both store
+    # a report; whichever was computed from older data loses
+    statement = insert(AIReport).values(
+        user_id=user_id,
+        data_version=version,
+        payload=json.dumps(payload, separators=(',', ':')),
+        computed_at=datetime.utcnow()
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[AIReport.user_id],
+        set_={
+            "data_version": statement.excluded.data_version,
+            "payload": statement.excluded.payload,
+            "computed_at": statement.excluded.computed_at
+        },
+        where=statement.excluded.data_version >= AIReport.data_version
+    ))
+    db.commit()
+
+
+def get_report(db: Session, user_id: int, with_insights: bool = False, user_key=None) -> Dict:
+    """
+    The user's stored report if it matches their current data version,
+    otherwise a freshly computed (and stored) one. When new insights could
+    not be generated, previous_insights keeps the last ones, however stale.
+    """
+    # Anomaly fences need the full history in the sketches
+    ensure_backfilled(db, user_id, "sketches")
+    version = get_data_version(db, user_id)
+    stored = db.query(AIReport).filter(AIReport.user_id == user_id).first()
+    previous = json.loads(stored.payload) if stored is not None else None
+    if previous is not None and stored.data_version == version:
+        if previous['insights'] is not None or not with_insights:
+            return previous
+
+    payload = compute_report(db, user_id, with_insights, user_key)
+    if payload['insights'] is None and previous is not None:
+        payload['previous_insights'] = previous['insights'] or previous.get('previous_insights')
+    _store_report(db, user_id, version, payload)
+    return payload
+
+
+def refresh_report(db: Session, user_id: int) -> bool:
+    """
+    Recompute a user's report unless a complete one for the current data
+    version is already stored. Returns whether it was recomputed.
+    """
+    ensure_backfilled(db, user_id, "sketches")
+    version = get_data_version(db, user_id)
+    stored = db.query(AIReport.data_version, AIReport.payload)\
+        .filter(AIReport.user_id == user_id).first()
+    if stored is not None and stored.data_version == version \
+            and json.loads(stored.payload)['insights'] is not None:
+        return False
+    _store_report(db, user_id, version, compute_report(db, user_id))
+    return True
+
+
+def active_user_ids(db: Session, now: Optional[datetime] = None) -> List[int]:
+    since = (now or datetime.utcnow()) - timedelta(days=ACTIVE_DAYS)
+    recent_writers = set()
+    for user_ids in fan_out(lambda shard_db: [
+        user_id for (user_id,) in shard_db.query(Transaction.user_id)
+        .filter(Transaction.date >= since).distinct()
+    ]):
+        recent_writers.update(user_ids)
+    recent_logins = {
+        user_id for (user_id,) in db.query(User.id).filter(User.last_login >= since)
+    }
+    return sorted(recent_writers | recent_logins)
+
+
+def _refresh_user(user_id: int) -> bool:
+    db = session_for_user(user_id)
+    try:
+        return refresh_report(db, user_id)
+    except Exception:
+        logger.exception("Report for user %s failed", user_id)
+        return False
+    finally:
+        db.close()
+
+
+def precompute_reports(
+    user_ids: Iterable[int],
+    workers: int = Config.REPORT_WORKERS,
+    llm_calls_per_second: float = Config.REPORT_LLM_CALLS_PER_SECOND
+) -> int:
+    """
+    Refresh reports for the given users across a thread pool whose threads
+    share one LLM rate limiter, so the pass as a whole stays under
+    llm_calls_per_second. Returns the number of reports recomputed.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    # Threads rather than processes: a child forked from this multithreaded
+    # server can deadlock on a lock another thread held, and each process
+    # would rate-limit on its own
+    limiter = RateLimiter(llm_calls_per_second) if llm_calls_per_second else None
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(workers, len(user_ids))),
+        thread_name_prefix="reports",
+        initializer=set_llm_rate_limit,
+        initargs=(limiter,)
+    ) as pool:
+        return sum(pool.map(_refresh_user, user_ids))
+
+
+def run_nightly_reports() -> int:
+    """
+    One off-peak pass over every active user. Best effort at once per host
+    per day when the cache backend is shared.
+    """
+    marker = f"reports:nightly:{datetime.now():%Y-%m-%d}"
+    if shared_cache.get(marker) is not None:
+        return 0
+    shared_cache.set(marker, True, ttl=2 * 24 * 60 * 60)
+
+    db = SessionLocal()
+    try:
+        user_ids = active_user_ids(db)
+    finally:
+        db.close()
+    refreshed = precompute_reports(user_ids)
+    logger.info("Nightly reports: %s of %s active users recomputed", refreshed, len(user_ids))
+    return refreshed
+
+
+class ReportScheduler:
+    """
+    Background thread that archives closed months and then runs the report
+    pass daily at Config.REPORT_HOUR
+    """
+
+    def __init__(self, hour: int = Config.REPORT_HOUR):
+        self.hour = hour
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        next_run = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="report-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.seconds_until_next_run()):
+            try:
+                run_archival()
+            except Exception:
+                logger.exception("Nightly archival failed")
+            try:
+                run_nightly_reports()
+            except Exception:
+                logger.exception("Nightly report run failed")
+
+
+report_scheduler = ReportScheduler()
@@ -0,0 +1,168 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import DateTime, Float, Integer, String, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .utils import to_cents, from_cents
+
+# External-content FTS5 index over transactions. user_id is indexed as a
+# token so a user's matches are intersected inside the index rather than
+# filtered afterwards. Only updates of indexed columns touch the index, not
+# amount, key or classification rewrites.
+SEARCH_INDEX_DDL = [
+    # Replaced rather than kept: older databases have an update trigger
+    # that fires on every column
+    "DROP TRIGGER IF EXISTS transactions_fts_update",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        description, category, user_id,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, description, category, user_id)
+        VALUES (new.id, new.description, new.category, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, category, user_id)
+        VALUES ('delete', old.id, old.description, old.category, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description, category, user_id
+    ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, description, category, user_id)
+        VALUES ('delete', old.id, old.description, old.category, old.user_id);
+        INSERT INTO transactions_fts(rowid, description, category, user_id)
+        VALUES (new.id, new.description, new.category, new.user_id);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the FTS5 index and its sync triggers, back-filling existing rows
+    the first time the index is created
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+        )).first()
+        for statement in SEARCH_INDEX_DDL:
+            conn.execute(text(statement))
+        if not exists:
+            conn.execute(text("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')"))
+
+
+def drop_search_index(engine: Engine) -> None:
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS transactions_fts"))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 query: every word must match, and a word
+    ending in '*' matches as a prefix. Returns None if there are no words.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(query):
+        word = token.rstrip('*')
+        if not word:
+            continue
+        terms.append(f'"{word}"*' if token.endswith('*') else f'"{word}"')
+    if not terms:
+        return None
+    return ' '.join(terms)
+
+
+def search_transactions(
+    db: Session,
+    user_id: int,
+    query: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = 20,
+    offset: int = 0,
+    archives: Sequence[Session] = ()
+) -> Dict:
+    """
+    Ranked, paginated full-text search over a user's transactions. Archive
+    sessions (see app.archive.archive_sessions) are searched through their
+    own indexes and merged with the hot results by rank.
+    """
+    match = build_match_query(query)
+    if match is None:
+        return {"results": [], "has_more": False}
+
+    filters = []
+    params = {
+        # The words are scoped to the text columns so they never match user_id
+        "match": f'user_id : "{int(user_id)}" AND {{description category}} : ({match})',
+        "limit": limit + 1,
+        "offset": offset
+    }
+    if start_date is not None:
+        filters.append("t.date >= :start_date")
+        params["start_date"] = start_date
+    if end_date is not None:
+        filters.append("t.date <= :end_date")
+        params["end_date"] = end_date
+    if min_amount is not None:
+        filters.append("t.amount_cents >= :min_cents")
+        params["min_cents"] = to_cents(min_amount)
+    if max_amount is not None:
+        filters.append("t.amount_cents <= :max_cents")
+        params["max_cents"] = to_cents(max_amount)
+    extra = ''.join(f" AND {f}" for f in filters)
+
+    if archives:
+        # Each source returns its best offset + limit + 1; the merged page is cut afterwards
+        params["limit"], params["offset"] = offset + limit + 1, 0
+
+    # bm25 weights: description matters most, category less, user_id not at all
+    statement = text(f"""
+        SELECT t.id, t.amount_cents, t.description, t.category, t.date,
+               bm25(transactions_fts, 10.0, 3.0, 0.0) AS rank
+        FROM transactions_fts
+        JOIN transactions t ON t.id = transactions_fts.rowid
+        WHERE transactions_fts MATCH :match{extra}
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    """).columns(
+        id=Integer, amount_cents=Integer, description=String, category=String,
+        date=DateTime, rank=Float
+    )
+    rows = []
+    for source in (db, *archives):
+        rows += source.execute(statement, params).all()
+    if archives:
+        rows = sorted(rows, key=lambda row: row.rank)[offset:offset + limit + 1]
+
+    results: List[Dict] = [
+        {
+            "id": row.id,
+            "amount": from_cents(row.amount_cents),
+            "description": row.description,
+            "category": row.category,
+            "date": row.date.isoformat(),
+            "score": round(-row.rank, 4)
+        }
+        for row in rows[:limit]
+    ]
+    return {"results": results, "has_more": len(rows) > limit}
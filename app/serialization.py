@@ -0,0 +1,64 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from .models.database import Transaction
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is the fallback
+    orjson = None
+
+# Wire-format expressions for transaction fields, computed in SQL so rows
+# come back ready to encode. SQLite's cents / 100.0 is the same IEEE
+# division as from_cents.
+TRANSACTION_JSON_COLUMNS = {
+    "id": Transaction.id,
+    "amount": Transaction.amount_cents / 100.0,
+    "description": Transaction.description,
+    "category": Transaction.category,
+    "date": Transaction.date,
+    "predicted_category": func.coalesce(Transaction.predicted_category, ''),
+    "confidence_score": func.coalesce(Transaction.confidence_score, 0.0),
+}
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Compact UTF-8 JSON. Plain dicts, lists, numbers, strings and datetimes
+    are encoded natively; anything else goes through jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=jsonable_encoder)
+    return json.dumps(
+        obj, separators=(',', ':'), ensure_ascii=False, default=_default
+    ).encode('utf-8')
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return jsonable_encoder(value)
+
+
+def json_response(obj: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """JSONResponse without the jsonable_encoder pass over every value"""
+    return Response(content=dumps(obj), media_type="application/json", headers=headers)
+
+
+def select_transactions(*fields: str) -> Select:
+    """Core SELECT of the named TRANSACTION_JSON_COLUMNS, labelled by field name"""
+    return select(*(TRANSACTION_JSON_COLUMNS[name].label(name) for name in fields))
+
+
+def fetch_dicts(db: Session, statement: Select) -> List[Dict]:
+    """Run a Core SELECT and return plain dicts, with no ORM entities built"""
+    result = db.execute(statement)
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
@@ -1,27 +1,46 @@
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from sqlalchemy import func
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from ..models.database import Transaction, User
+from ..archive import archive_sessions
+from ..group_commit import writer_for_user
+from ..utils import get_period_start, from_cents
+
+DASHBOARD_FIELDS = ('stats', 'trends', 'category_totals', 'recent_transactions')
 
 class TransactionService:
     @staticmethod
     async def create_transaction(db: Session, user_id: int, amount: float, description: str, category: str = None):
-        transaction = Transaction(
-            user_id=user_id,
-            amount=amount,
-            description=description,
-            category=category
-        )
-        db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        transaction, _ = await writer_for_user(user_id).insert({
+            "user_id": user_id,
+            "amount": amount,
+            "description": description,
+            "category": category
+        })
         return transaction
 
     @staticmethod
     async def get_user_transactions(db: Session, user_id: int) -> List[Transaction]:
         return db.query(Transaction).filter(Transaction.user_id == user_id).all()
 
+    @staticmethod
+    def get_totals(db: Session, user_id: int) -> Tuple[int, int, int]:
+        """All-time total, largest amount (cents) and count, hot and archived"""
+        total_cents = largest_cents = transaction_count = 0
+        with archive_sessions(db) as archived:
+            for source in (db, *archived):
+                total, largest, count = source.query(
+                    func.coalesce(func.sum(Transaction.amount_cents), 0),
+                    func.coalesce(func.max(Transaction.amount_cents), 0),
+                    func.count(Transaction.id)
+                ).filter(Transaction.user_id == user_id).one()
+                if count:
+                    largest_cents = max(largest_cents, largest) if transaction_count else largest
+                total_cents += total
+                transaction_count += count
+        return total_cents, largest_cents, transaction_count
+
     @staticmethod
     def get_quick_stats(db: Session, user_id: int) -> Dict:
         transactions = db.query(Transaction)\
@@ -36,28 +55,28 @@ class TransactionService:
                 "transaction_count": 0
             }
 
-        total_spending = sum(t.amount for t in transactions)
-        largest_expense = max(t.amount for t in transactions)
+        total_cents = sum(t.amount_cents for t in transactions)
+        largest_cents = max(t.amount_cents for t in transactions)
         transaction_count = len(transactions)
         
         # Calculate monthly average
         if transaction_count > 0:
             oldest_transaction = min(t.date for t in transactions)
-            months = max(1, (datetime.now() - oldest_transaction).days / 30)
-            monthly_average = total_spending / months
+            months = max(1, (datetime.utcnow() - oldest_transaction).days / 30)
+            monthly_average_cents = round(total_cents / months)
         else:
-            monthly_average = 0
+            monthly_average_cents = 0
 
         return {
-            "total_spending": round(total_spending, 2),
-            "monthly_average": round(monthly_average, 2),
-            "largest_expense": round(largest_expense, 2),
+            "total_spending": from_cents(total_cents),
+            "monthly_average": from_cents(monthly_average_cents),
+            "largest_expense": from_cents(largest_cents),
             "transaction_count": transaction_count
         }
 
     @staticmethod
     def get_spending_analysis(db: Session, user_id: int) -> Dict:
-        thirty_days_ago = datetime.now() - timedelta(days=30)
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         transactions = db.query(Transaction)\
             .filter(Transaction.user_id == user_id)\
             .filter(Transaction.date >= thirty_days_ago)\
@@ -67,7 +86,7 @@ class TransactionService:
         if not transactions:
             return {
                 "spending_trends": {
-                    "dates": [(datetime.now() - timedelta(days=x)).strftime('%Y-%m-%d') for x in range(30)],
+                    "dates": [(datetime.utcnow() - timedelta(days=x)).strftime('%Y-%m-%d') for x in range(30)],
                     "amounts": [0] * 30
                 },
                 "category_totals": {
@@ -85,15 +104,97 @@ class TransactionService:
 
         for t in transactions:
             date_str = t.date.strftime('%Y-%m-%d')
-            daily_spending[date_str] = daily_spending.get(date_str, 0) + t.amount
+            daily_spending[date_str] = daily_spending.get(date_str, 0) + t.amount_cents
             
             category = t.category or 'Uncategorized'
-            category_totals[category] = category_totals.get(category, 0) + t.amount
+            category_totals[category] = category_totals.get(category, 0) + t.amount_cents
 
         return {
             "spending_trends": {
                 "dates": list(daily_spending.keys()),
-                "amounts": list(daily_spending.values())
+                "amounts": [from_cents(v) for v in daily_spending.values()]
             },
-            "category_totals": category_totals
-        } 
\ No newline at end of file
+            "category_totals": {k: from_cents(v) for k, v in category_totals.items()}
+        }
+
+    @staticmethod
+    def get_dashboard(
+        db: Session,
+        user_id: int,
+        period: str = 'month',
+        recent_limit: int = 10,
+        fields: Tuple[str, ...] = DASHBOARD_FIELDS
+    ) -> Dict:
+        """
+        Everything the dashboard needs in one call, computed with SQL aggregates
+        instead of loading every row
+        """
+        now = datetime.utcnow()
+        start_date = get_period_start(period, now)
+        dashboard = {}
+
+        if 'stats' in fields:
+            total_cents, largest_cents, transaction_count = TransactionService.get_totals(db, user_id)
+            dashboard['stats'] = {
+                "total_spending": from_cents(total_cents),
+                "monthly_average": from_cents(round(total_cents / 30)),
+                "largest_expense": from_cents(largest_cents),
+                "transaction_count": transaction_count
+            }
+
+        if 'trends' in fields:
+            day = func.date(Transaction.date)
+            daily_spending = dict(
+                db.query(day, func.sum(func.abs(Transaction.amount_cents)))
+                .filter(Transaction.user_id == user_id)
+                .filter(Transaction.date >= start_date)
+                .group_by(day)
+                .all()
+            )
+            date_range = [
+                (start_date + timedelta(days=i)).strftime('%Y-%m-%d')
+                for i in range((now - start_date).days + 1)
+            ]
+            dashboard['trends'] = {
+                "dates": date_range,
+                "amounts": [from_cents(daily_spending.get(date, 0)) for date in date_range]
+            }
+
+        if 'category_totals' in fields:
+            category = func.coalesce(Transaction.category, 'Other')
+            dashboard['category_totals'] = {
+                name: from_cents(cents)
+                for name, cents in db.query(category, func.sum(func.abs(Transaction.amount_cents)))
+                .filter(Transaction.user_id == user_id)
+                .filter(Transaction.date >= start_date)
+                .group_by(category)
+                .all()
+            }
+
+        if 'recent_transactions' in fields:
+            rows = db.query(
+                Transaction.id,
+                Transaction.amount_cents,
+                Transaction.description,
+                Transaction.category,
+                Transaction.date,
+                Transaction.predicted_category,
+                Transaction.confidence_score
+            ).filter(Transaction.user_id == user_id)\
+                .order_by(Transaction.date.desc())\
+                .limit(recent_limit)\
+                .all()
+            dashboard['recent_transactions'] = [
+                {
+                    "id": t.id,
+                    "amount": from_cents(t.amount_cents),
+                    "description": t.description,
+                    "category": t.category,
+                    "date": t.date.isoformat(),
+                    "predicted_category": t.predicted_category or "",
+                    "confidence_score": t.confidence_score or 0.0
+                }
+                for t in rows
+            ]
+
+        return dashboard
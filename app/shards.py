@@ -0,0 +1,120 @@
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from .config import Config
+from .models.database import (
+    AIReport, AmountSketch, Base, HistoryBackfill, RecurringSeries, SessionLocal, Transaction, User, UserVersion,
+    engine
+)
+from .search import ensure_search_index
+
+T = TypeVar('T')
+
+
+def _enable_wal(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+class ShardRouter:
+    """
+    Routes each user's transactions to one of `count` SQLite files by a
+    stable hash of the user id, so writers for different shards never
+    contend for the same lock. Users and reports stay in the main database:
+    a user's session binds Transaction, its derived tables, the user's data
+    version (and raw SQL) to the user's shard and users and reports to the
+    main engine.
+    """
+
+    def __init__(self, count: int, path_template: str, main_engine: Engine = engine):
+        self.count = count
+        self.path_template = path_template
+        self.main_engine = main_engine
+        self._engines: Dict[int, Engine] = {}
+        self._session_factories: Dict[int, sessionmaker] = {}
+        self._lock = threading.Lock()
+
+    def shard_for(self, user_id: int) -> int:
+        # crc32 rather than hash(): the same user must land on the same file in every process
+        return zlib.crc32(str(user_id).encode('ascii')) % self.count
+
+    def engine(self, shard: int) -> Engine:
+        with self._lock:
+            shard_engine = self._engines.get(shard)
+            if shard_engine is None:
+                shard_engine = create_engine(f"sqlite:///{self.path_template.format(shard=shard)}")
+                event.listen(shard_engine, "connect", _enable_wal)
+                Base.metadata.create_all(
+                    bind=shard_engine, tables=[Transaction.__table__, RecurringSeries.__table__, AmountSketch.__table__,
+                            UserVersion.__table__, HistoryBackfill.__table__]
+                )
+                ensure_search_index(shard_engine)
+                self._engines[shard] = shard_engine
+                self._session_factories[shard] = sessionmaker(
+                    autocommit=False, autoflush=False, bind=shard_engine,
+                    binds={User: self.main_engine, AIReport: self.main_engine}
+                )
+            return shard_engine
+
+    def session_for_shard(self, shard: int) -> Session:
+        self.engine(shard)
+        return self._session_factories[shard]()
+
+    def session(self, user_id: int) -> Session:
+        return self.session_for_shard(self.shard_for(user_id))
+
+    def dispose(self, close: bool = True) -> None:
+        with self._lock:
+            for shard_engine in self._engines.values():
+                shard_engine.dispose(close=close)
+
+    def fan_out(self, fn: Callable[[Session], T]) -> List[T]:
+        """
+        Run fn against every shard concurrently, one session each, and
+        return the results in shard order. For admin and cross-user queries.
+        """
+        def run(shard: int) -> T:
+            db = self.session_for_shard(shard)
+            try:
+                return fn(db)
+            finally:
+                db.close()
+
+        with ThreadPoolExecutor(max_workers=self.count) as pool:
+            return list(pool.map(run, range(self.count)))
+
+
+# Sharding is off unless SHARD_COUNT is above 1
+shard_router: Optional[ShardRouter] = (
+    ShardRouter(Config.SHARD_COUNT, Config.SHARD_PATH) if Config.SHARD_COUNT > 1 else None
+)
+
+
+def session_for_user(user_id: Optional[int]) -> Session:
+    """
+    Session for one user's data: their shard when sharding is on, otherwise
+    (or with no user) the main database
+    """
+    if shard_router is None or user_id is None:
+        return SessionLocal()
+    return shard_router.session(user_id)
+
+
+def fan_out(fn: Callable[[Session], T]) -> List[T]:
+    """fn applied to every shard's session, or once to the main database"""
+    if shard_router is None:
+        db = SessionLocal()
+        try:
+            return [fn(db)]
+        finally:
+            db.close()
+    return shard_router.fan_out(fn)
+
@@ -0,0 +1,195 @@
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .archive import archive_sessions
+from .models.database import AmountSketch, Transaction
+from .utils import from_cents
+
+# Sketch over all of a user's categories
+ALL_CATEGORIES = '*'
+
+RELATIVE_ACCURACY = 0.01
+# Fewer amounts than this give no anomaly fences for a category
+MIN_FENCE_COUNT = 5
+
+# Bucket cap: 1% buckets span 1 cent to $10M with room to spare, so
+# collapsing only guards against bad data
+MAX_BUCKETS = 2048
+
+
+class QuantileSketch:
+    """
+    Mergeable streaming quantile sketch (DDSketch): positive values are
+    counted in logarithmic buckets, so every quantile is within
+    RELATIVE_ACCURACY of a true value. Adds are O(1) and memory is bounded
+    by the value range, whatever the number of values.
+    """
+    __slots__ = ('gamma', '_log_gamma', 'buckets', 'count', 'min', 'max')
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value <= 0:
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        for bound in (other.min, other.max):
+            if bound is not None:
+                self.min = bound if self.min is None else min(self.min, bound)
+                self.max = bound if self.max is None else max(self.max, bound)
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        # Fold the lowest buckets together; only low quantiles lose accuracy
+        indexes = sorted(self.buckets)
+        excess = indexes[:len(indexes) - MAX_BUCKETS + 1]
+        self.buckets[excess[-1]] += sum(self.buckets.pop(index) for index in excess[:-1])
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "gamma": self.gamma, "min": self.min, "max": self.max,
+            "buckets": [[index, count] for index, count in self.buckets.items()]
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'QuantileSketch':
+        data = json.loads(payload)
+        sketch = cls()
+        sketch.gamma = data["gamma"]
+        sketch._log_gamma = math.log(sketch.gamma)
+        sketch.buckets = {index: count for index, count in data["buckets"]}
+        sketch.count = sum(sketch.buckets.values())
+        sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+def record_amounts(db: Session, rows: Iterable[Tuple[int, Optional[str], int]]) -> None:
+    """
+    Add new (user_id, category, amount_cents) rows to their user's
+    per-category and all-category sketches. One lookup per user and O(1)
+    work per row; call inside the transaction that inserts the rows.
+    """
+    by_user: Dict[int, Dict[str, List[int]]] = {}
+    for user_id, category, amount_cents in rows:
+        if user_id is None or not amount_cents:
+            continue
+        per_category = by_user.setdefault(user_id, {})
+        for key in (category or 'Other', ALL_CATEGORIES):
+            per_category.setdefault(key, []).append(abs(amount_cents))
+
+    for user_id, per_category in by_user.items():
+        stored = {
+            row.category: row for row in db.query(AmountSketch).filter(
+                AmountSketch.user_id == user_id, AmountSketch.category.in_(list(per_category))
+            )
+        }
+        for category, amounts in per_category.items():
+            row = stored.get(category)
+            sketch = QuantileSketch.from_json(row.payload) if row is not None else QuantileSketch()
+            for amount in amounts:
+                sketch.add(amount)
+            if row is None:
+                db.add(AmountSketch(user_id=user_id, category=category,
+                                    count=sketch.count, payload=sketch.to_json()))
+            else:
+                row.count = sketch.count
+                row.payload = sketch.to_json()
+
+
+def load_sketch(db: Session, user_id: int, category: Optional[str] = None) -> QuantileSketch:
+    """A user's sketch for one category, or across all categories"""
+    row = db.query(AmountSketch).filter(
+        AmountSketch.user_id == user_id,
+        AmountSketch.category == (category or ALL_CATEGORIES)
+    ).first()
+    return QuantileSketch.from_json(row.payload) if row is not None else QuantileSketch()
+
+
+def amount_quantiles(db: Session, user_id: int, quantiles: List[float],
+                     category: Optional[str] = None) -> Dict:
+    """Approximate spending quantiles (in dollars) from the stored sketch"""
+    sketch = load_sketch(db, user_id, category)
+    return {
+        "category": category,
+        "count": sketch.count,
+        "relative_accuracy": RELATIVE_ACCURACY,
+        "quantiles": {
+            str(q): from_cents(round(value)) if (value := sketch.quantile(q)) is not None else None
+            for q in quantiles
+        }
+    }
+
+
+def anomaly_fences(db: Session, user_id: int) -> Dict[str, Tuple[float, float, float, float]]:
+    """
+    Tukey fences per category from the user's stored sketches, in cents:
+    (outer low, inner low, inner high, outer high), i.e. 3 and 1.5
+    interquartile ranges beyond the quartiles. Robust to the outliers they
+    are meant to flag, and one row per category whatever the history length.
+    """
+    fences = {}
+    for row in db.query(AmountSketch).filter(
+        AmountSketch.user_id == user_id,
+        AmountSketch.category != ALL_CATEGORIES,
+        AmountSketch.count >= MIN_FENCE_COUNT
+    ):
+        sketch = QuantileSketch.from_json(row.payload)
+        q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+        spread = q3 - q1
+        fences[row.category] = (q1 - 3 * spread, q1 - 1.5 * spread, q3 + 1.5 * spread, q3 + 3 * spread)
+    return fences
+
+
+def rebuild_sketches(db: Session, user_id: int) -> int:
+    """
+    One-off back-fill of a user's sketches from their full history, hot and
+    archived. Inserts keep them current afterwards. Leaves the commit to
+    the caller (see app.backfill). Returns the amounts added.
+    """
+    db.query(AmountSketch).filter(AmountSketch.user_id == user_id)\
+        .delete(synchronize_session=False)
+    rows = []
+    with archive_sessions(db) as archived:
+        for source in (db, *archived):
+            # Keyed like the insert paths: the user's category, else the predicted one
+            rows += [
+                (user_id, category or predicted_category, amount_cents)
+                for category, predicted_category, amount_cents in source.query(
+                    Transaction.category, Transaction.predicted_category, Transaction.amount_cents
+                ).filter(Transaction.user_id == user_id)
+            ]
+    record_amounts(db, rows)
+    db.flush()
+    return len(rows)
@@ -7,15 +7,16 @@ Chart.defaults.scale.grid.color = '#e2e8f0';
 let spendingTrendsChart;
 let categoryChart;
 
+// Live update stream
+let dashboardEvents;
+
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize charts
     initializeCharts();
     
-    // Load initial data
-    loadUserInfo();
-    loadQuickStats();
-    loadTransactions();
-    loadSpendingAnalysis();
+    // Load initial data in a single round trip
+    loadDashboard();
+    connectDashboardEvents();
 
     // Set up form handlers
     document.getElementById('transactionForm').addEventListener('submit', handleTransactionSubmit);
@@ -29,8 +30,6 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    checkAuth();
-    
     // Add logout button to navbar if it doesn't exist
     const navbar = document.querySelector('.navbar');
     if (!document.querySelector('.logout-btn')) {
@@ -140,12 +139,37 @@ function initializeCharts() {
     });
 }
 
+async function loadDashboard(period = 'month') {
+    try {
+        const response = await fetch(`/api/dashboard?period=${period}`);
+        if (response.status === 401) {
+            window.location.href = '/login';
+            return;
+        }
+        const dashboard = await response.json();
+
+        renderUserInfo(dashboard.user);
+        renderQuickStats(dashboard.stats);
+        renderTransactions(dashboard.recent_transactions);
+        renderSpendingAnalysis({
+            spending_trends: dashboard.trends,
+            category_totals: dashboard.category_totals
+        });
+    } catch (error) {
+        console.error('Error loading dashboard:', error);
+        showErrorToast('Failed to load dashboard');
+    }
+}
+
+function renderUserInfo(user) {
+    document.querySelector('.user-name').textContent = user.name;
+    document.querySelector('.user-email').textContent = user.email;
+}
+
 async function loadUserInfo() {
     try {
         const response = await fetch('/api/user');
-        const user = await response.json();
-        document.querySelector('.user-name').textContent = user.name;
-        document.querySelector('.user-email').textContent = user.email;
+        renderUserInfo(await response.json());
     } catch (error) {
         console.error('Error loading user info:', error);
         showErrorToast('Failed to load user information');
@@ -155,18 +179,20 @@ async function loadUserInfo() {
 async function loadQuickStats() {
     try {
         const response = await fetch('/api/quick-stats');
-        const stats = await response.json();
-        
-        updateStatCard('totalSpending', stats.total_spending, 'Total Spending');
-        updateStatCard('monthlyAverage', stats.monthly_average, 'Monthly Average');
-        updateStatCard('largestExpense', stats.largest_expense, 'Largest Expense');
-        updateStatCard('transactionCount', stats.transaction_count, 'Total Transactions', false);
+        renderQuickStats(await response.json());
     } catch (error) {
         console.error('Error loading quick stats:', error);
         showErrorToast('Failed to load statistics');
     }
 }
 
+function renderQuickStats(stats) {
+    updateStatCard('totalSpending', stats.total_spending, 'Total Spending');
+    updateStatCard('monthlyAverage', stats.monthly_average, 'Monthly Average');
+    updateStatCard('largestExpense', stats.largest_expense, 'Largest Expense');
+    updateStatCard('transactionCount', stats.transaction_count, 'Total Transactions', false);
+}
+
 function updateStatCard(id, value, label, isCurrency = true) {
     const card = document.getElementById(id);
     const valueElement = card.querySelector('.value');
@@ -186,71 +212,75 @@ function updateStatCard(id, value, label, isCurrency = true) {
 async function loadTransactions() {
     try {
         const response = await fetch('/api/transactions');
-        const transactions = await response.json();
-        
-        const transactionsList = document.getElementById('recentTransactions');
-        
-        if (!transactions.length) {
-            transactionsList.innerHTML = `
-                <div class="empty-state">
-                    <svg class="empty-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor">
-                        <path d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z"></path>
-                    </svg>
-                    <p>No transactions yet</p>
-                    <button class="add-transaction-btn" onclick="showAddTransactionModal()">
-                        Add Your First Transaction
-                    </button>
-                </div>
-            `;
-            return;
-        }
-        
-        transactionsList.innerHTML = transactions.map(transaction => `
-            <div class="transaction-item ${transaction.amount < 0 ? 'expense' : 'income'}">
-                <div class="transaction-info">
-                    <span class="description">${transaction.description}</span>
-                    <span class="category">${transaction.category}</span>
-                </div>
-                <span class="amount">
-                    ${formatCurrency(Math.abs(transaction.amount))}
-                </span>
-            </div>
-        `).join('');
+        renderTransactions(await response.json());
     } catch (error) {
         console.error('Error loading transactions:', error);
         showErrorToast('Failed to load transactions');
     }
 }
 
+function renderTransactions(transactions) {
+    const transactionsList = document.getElementById('recentTransactions');
+    
+    if (!transactions.length) {
+        transactionsList.innerHTML = `
+            <div class="empty-state">
+                <svg class="empty-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor">
+                    <path d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z"></path>
+                </svg>
+                <p>No transactions yet</p>
+                <button class="add-transaction-btn" onclick="showAddTransactionModal()">
+                    Add Your First Transaction
+                </button>
+            </div>
+        `;
+        return;
+    }
+    
+    transactionsList.innerHTML = transactions.map(transaction => `
+        <div class="transaction-item ${transaction.amount < 0 ? 'expense' : 'income'}">
+            <div class="transaction-info">
+                <span class="description">${transaction.description}</span>
+                <span class="category">${transaction.category}</span>
+            </div>
+            <span class="amount">
+                ${formatCurrency(Math.abs(transaction.amount))}
+            </span>
+        </div>
+    `).join('');
+}
+
 async function loadSpendingAnalysis(period = 'month') {
     try {
         const response = await fetch(`/api/analysis?period=${period}`);
-        const data = await response.json();
-        
-        // Update spending trends chart
-        if (spendingTrendsChart) {
-            spendingTrendsChart.data.labels = data.spending_trends.dates.map(date => 
-                new Date(date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })
-            );
-            spendingTrendsChart.data.datasets[0].data = data.spending_trends.amounts;
-            spendingTrendsChart.update();
-        }
-
-        // Update category chart
-        if (categoryChart) {
-            const categories = Object.keys(data.category_totals);
-            const amounts = Object.values(data.category_totals);
-            
-            categoryChart.data.labels = categories;
-            categoryChart.data.datasets[0].data = amounts;
-            categoryChart.update();
-        }
+        renderSpendingAnalysis(await response.json());
     } catch (error) {
         console.error('Error loading spending analysis:', error);
         showErrorToast('Failed to load analysis');
     }
 }
 
+function renderSpendingAnalysis(data) {
+    // Update spending trends chart
+    if (spendingTrendsChart) {
+        spendingTrendsChart.data.labels = data.spending_trends.dates.map(date => 
+            new Date(date).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })
+        );
+        spendingTrendsChart.data.datasets[0].data = data.spending_trends.amounts;
+        spendingTrendsChart.update();
+    }
+
+    // Update category chart
+    if (categoryChart) {
+        const categories = Object.keys(data.category_totals);
+        const amounts = Object.values(data.category_totals);
+        
+        categoryChart.data.labels = categories;
+        categoryChart.data.datasets[0].data = amounts;
+        categoryChart.update();
+    }
+}
+
 async function handleTransactionSubmit(e) {
     e.preventDefault();
     
@@ -272,9 +302,11 @@ async function handleTransactionSubmit(e) {
         if (response.ok) {
             showSuccessToast('Transaction added successfully');
             closeAddTransactionModal();
-            // Reload data
-            loadQuickStats();
-            loadTransactions();
+            // Transactions and stats arrive over the event stream when it is connected
+            if (!isDashboardStreamOpen()) {
+                loadQuickStats();
+                loadTransactions();
+            }
             loadSpendingAnalysis();
         } else {
             throw new Error('Failed to add transaction');
@@ -285,6 +317,57 @@ async function handleTransactionSubmit(e) {
     }
 }
 
+function connectDashboardEvents() {
+    if (!window.EventSource) {
+        return;
+    }
+
+    dashboardEvents = new EventSource('/api/events');
+
+    dashboardEvents.addEventListener('transaction', (e) => {
+        prependTransaction(JSON.parse(e.data));
+    });
+
+    dashboardEvents.addEventListener('quick_stats', (e) => {
+        const stats = JSON.parse(e.data);
+        updateStatCard('totalSpending', stats.total_spending, 'Total Spending');
+        updateStatCard('monthlyAverage', stats.monthly_average, 'Monthly Average');
+        updateStatCard('largestExpense', stats.largest_expense, 'Largest Expense');
+        updateStatCard('transactionCount', stats.transaction_count, 'Total Transactions', false);
+    });
+
+    dashboardEvents.addEventListener('anomaly', (e) => {
+        const anomaly = JSON.parse(e.data);
+        showWarningToast(`${anomaly.transaction.description}: ${anomaly.reason}`);
+    });
+
+    // The server dropped events for this connection, so refetch everything
+    dashboardEvents.addEventListener('resync', () => loadDashboard());
+}
+
+function isDashboardStreamOpen() {
+    return dashboardEvents && dashboardEvents.readyState === EventSource.OPEN;
+}
+
+function prependTransaction(transaction) {
+    const transactionsList = document.getElementById('recentTransactions');
+    if (transactionsList.querySelector('.empty-state')) {
+        transactionsList.innerHTML = '';
+    }
+
+    transactionsList.insertAdjacentHTML('afterbegin', `
+        <div class="transaction-item ${transaction.amount < 0 ? 'expense' : 'income'}">
+            <div class="transaction-info">
+                <span class="description">${transaction.description}</span>
+                <span class="category">${transaction.category}</span>
+            </div>
+            <span class="amount">
+                ${formatCurrency(Math.abs(transaction.amount))}
+            </span>
+        </div>
+    `);
+}
+
 function formatCurrency(amount) {
     return new Intl.NumberFormat('en-US', {
         style: 'currency',
@@ -418,9 +501,7 @@ function switchPage(pageName) {
     // Load page-specific data
     switch(pageName) {
         case 'dashboard':
-            loadQuickStats();
-            loadTransactions();
-            loadSpendingAnalysis();
+            loadDashboard();
             break;
         case 'transactions':
             loadAllTransactions();
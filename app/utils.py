@@ -1,13 +1,47 @@
-from datetime import datetime
+import math
+import hashlib
+import numbers
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from decimal import Decimal, ROUND_HALF_UP
 
+def to_cents(amount) -> int:
+    """
+    Convert a dollar amount to integer cents, rounding half up like the
+    Decimal-based formatter always has. Raises ValueError for anything but
+    a finite int, float or Decimal; bools and numeric strings included.
+    """
+    if isinstance(amount, bool) or not isinstance(amount, (numbers.Real, Decimal)):
+        raise ValueError(f"Amount must be a number, not {type(amount).__name__}")
+    if isinstance(amount, numbers.Integral):
+        return int(amount) * 100
+    if not math.isfinite(amount):
+        raise ValueError(f"Amount must be finite, not {amount}")
+    scaled = amount * 100
+    # Fast path: away from a .5 tie plain float rounding agrees with Decimal
+    if isinstance(amount, float) and abs(scaled) < 1e13 and abs(scaled - math.floor(scaled) - 0.5) > 1e-6:
+        return math.floor(scaled + 0.5)
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_cents(cents: int) -> float:
+    """
+    Convert integer cents back to a dollar float for JSON responses
+    """
+    return cents / 100
+
+def format_cents(cents: int) -> str:
+    """
+    Format integer cents as a currency string using integer arithmetic only
+    """
+    sign = '-' if cents < 0 else ''
+    dollars, remainder = divmod(abs(cents), 100)
+    return f"${sign}{dollars:,}.{remainder:02d}"
+
 def format_currency(amount: float) -> str:
     """
     Format amount to currency string with 2 decimal places
     """
-    decimal_amount = Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-    return f"${decimal_amount:,.2f}"
+    return format_cents(to_cents(amount))
 
 def calculate_monthly_summary(transactions: List[Dict]) -> Dict:
     """
@@ -66,6 +100,27 @@ def get_date_range_filter(start_date: Optional[datetime] = None,
         date_filter['date_lte'] = end_date
     return date_filter
 
+def normalize_description(description: Optional[str]) -> str:
+    """
+    Case- and whitespace-insensitive form of a transaction description
+    """
+    return " ".join((description or "").casefold().split())
+
+def dedup_key(description: Optional[str], amount_cents: int, date: datetime) -> str:
+    """
+    Identity of a transaction for duplicate detection: the same normalized
+    description and amount on the same day
+    """
+    identity = f"{normalize_description(description)}|{amount_cents}|{date:%Y-%m-%d}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+def get_period_start(period: str, now: datetime) -> datetime:
+    """
+    Start of a dashboard analysis window ('week', 'month' or 'year'; defaults to month)
+    """
+    days = {'week': 7, 'month': 30, 'year': 365}.get(period, 30)
+    return now - timedelta(days=days)
+
 def generate_transaction_summary(transaction: Dict) -> str:
     """
     Generate a human-readable summary of a transaction
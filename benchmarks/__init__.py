@@ -0,0 +1,10 @@
+"""
+Measurement scripts for the performance work in app/, run one at a time:
+
+    python -m benchmarks.<name>
+
+Each one builds scratch SQLite files in a temporary directory. Importing
+app.models.database still drops and recreates the tables of
+./finance_tracker.db, so run the database benchmarks from a scratch working
+directory (with the repository on PYTHONPATH) when that file matters.
+"""
@@ -0,0 +1,68 @@
+"""
+Cold load of a 100k-row history into TransactionColumns: ORM column query
+with a datetime per row, versus the Core select with text dates.
+
+    python -m benchmarks.columnar
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.columnar import TransactionColumns, select_columns
+from app.models.database import Base, Transaction
+
+
+def main(rows: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        bench_engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=bench_engine)
+        db = sessionmaker(bind=bench_engine)()
+        start = datetime(2024, 1, 1)
+        db.execute(Transaction.__table__.insert(), [
+            {
+                "user_id": 1,
+                "amount_cents": 100 + i % 50000,
+                "description": f"Merchant {i % 997}",
+                "category": ("Food", "Transport", "Shopping", None)[i % 4],
+                "date": start + timedelta(minutes=i),
+                "predicted_category": ("Food", "Transport", "Shopping", "Other")[i % 4]
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+
+        def orm_path() -> TransactionColumns:
+            return TransactionColumns.from_rows(
+                db.query(
+                    Transaction.amount_cents, Transaction.date, Transaction.category,
+                    Transaction.predicted_category, Transaction.description
+                ).filter(Transaction.user_id == 1)
+                .order_by(Transaction.date.asc(), Transaction.id.asc()).all()
+            )
+
+        def core_path() -> TransactionColumns:
+            return TransactionColumns.from_rows(db.execute(select_columns(1)).all())
+
+        for name, path in (("ORM rows + datetimes", orm_path), ("Core select + text dates", core_path)):
+            path()
+            tracemalloc.start()
+            started = time.perf_counter()
+            columns = path()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:>24}: {elapsed / rows * 1e6:5.2f} us/row, peak {peak / 2 ** 20:5.1f} MiB, "
+                  f"resident {columns.nbytes / 2 ** 20:4.1f} MiB")
+        assert np.array_equal(orm_path().timestamps, core_path().timestamps)
+        db.close()
+        bench_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
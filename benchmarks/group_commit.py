@@ -0,0 +1,68 @@
+"""
+Inserts per second for the one-commit-per-insert path against the
+group-commit writer, on a scratch SQLite database.
+
+    python -m benchmarks.group_commit
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import bump_data_version
+from app.group_commit import GroupCommitWriter
+from app.models.database import Base, Transaction, User
+
+
+def main(rows: int = 2000, threads: int = 32) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        bench_engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=bench_engine)
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=bench_engine)
+        setup = factory()
+        setup.add(User(username="bench", email="bench@example.com", name="bench"))
+        setup.commit()
+        user_id = setup.query(User.id).scalar()
+        setup.close()
+
+        def values(i: int) -> Dict:
+            return {
+                "user_id": user_id,
+                "amount": 10 + i % 100,
+                "description": f"Benchmark {i}",
+                "category": "Other",
+                "date": datetime.utcnow()
+            }
+
+        def single(i: int) -> None:
+            db = factory()
+            try:
+                transaction = Transaction(**values(i))
+                db.add(transaction)
+                bump_data_version(db, user_id)
+                db.commit()
+                db.refresh(transaction)
+            finally:
+                db.close()
+
+        writer = GroupCommitWriter(session_factory=factory)
+        for name, insert in (
+            ("commit per insert", single),
+            ("group commit", lambda i: writer.submit(values(i)).result()),
+        ):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(insert, range(rows)))
+            elapsed = time.perf_counter() - started
+            print(f"{name:>18}: {rows / elapsed:8.0f} inserts/s")
+        print(f"{'':>18}  {writer.rows} rows in {writer.batches} batches")
+        bench_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
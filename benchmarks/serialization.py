@@ -0,0 +1,87 @@
+"""
+Per-row time and peak memory for a 100k-row transaction list: ORM entities
+with hand-built dicts and jsonable_encoder, versus a Core column query and
+the fast encoder.
+
+    python -m benchmarks.serialization
+"""
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base, Transaction, User
+from app.serialization import TRANSACTION_JSON_COLUMNS, dumps, fetch_dicts, orjson, select_transactions
+
+
+def main(rows: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        bench_engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=bench_engine)
+        db = sessionmaker(bind=bench_engine)()
+        db.add(User(id=1, username="bench", email="bench@example.com", name="bench"))
+        start = datetime(2024, 1, 1)
+        db.execute(Transaction.__table__.insert(), [
+            {
+                "user_id": 1,
+                "amount_cents": 100 + i % 50000,
+                "description": f"Merchant {i % 997}",
+                "category": "Food",
+                "date": start + timedelta(minutes=i),
+                "predicted_category": "Food",
+                "confidence_score": 0.9
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+
+        def orm_path() -> bytes:
+            transactions = db.query(Transaction)\
+                .filter(Transaction.user_id == 1)\
+                .order_by(Transaction.date.desc())\
+                .all()
+            payload = [
+                {
+                    "id": t.id,
+                    "amount": t.amount,
+                    "description": t.description,
+                    "category": t.category,
+                    "date": t.date.isoformat(),
+                    "predicted_category": t.predicted_category or "",
+                    "confidence_score": t.confidence_score or 0.0
+                }
+                for t in transactions
+            ]
+            body = json.dumps(jsonable_encoder(payload), separators=(',', ':')).encode('utf-8')
+            db.expunge_all()
+            return body
+
+        def fast_path() -> bytes:
+            return dumps(fetch_dicts(db, select_transactions(*TRANSACTION_JSON_COLUMNS)
+                                     .where(Transaction.user_id == 1)
+                                     .order_by(Transaction.date.desc())))
+
+        print(f"{rows} rows, encoder: {'orjson' if orjson is not None else 'json'}")
+        for name, path in (("ORM + jsonable_encoder", orm_path), ("Core + fast encoder", fast_path)):
+            path()
+            tracemalloc.start()
+            started = time.perf_counter()
+            body = path()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:>24}: {elapsed / rows * 1e6:6.2f} us/row, "
+                  f"peak {peak / 2 ** 20:6.1f} MiB, body {len(body) / 2 ** 20:5.1f} MiB")
+        db.close()
+        bench_engine.dispose()
+
+
+
+if __name__ == "__main__":
+    main()
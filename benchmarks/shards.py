@@ -0,0 +1,49 @@
+"""
+Commit-per-insert throughput (each insert with its data version bump) with
+writers spread over 1, 2 and 4 shard files, one user per thread.
+
+    python -m benchmarks.shards
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.cache import bump_data_version
+from app.models.database import Transaction
+from app.shards import ShardRouter
+
+
+def main(inserts: int = 400, threads: int = 16) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (1, 2, 4):
+            router = ShardRouter(count, os.path.join(directory, f"bench_{count}_{{shard}}.db"))
+            # One user id per thread, chosen so threads spread evenly over shards
+            user_ids, candidate = [], 0
+            while len(user_ids) < threads:
+                candidate += 1
+                if router.shard_for(candidate) == len(user_ids) % count:
+                    user_ids.append(candidate)
+
+            def write(user_id: int) -> None:
+                db = router.session(user_id)
+                try:
+                    for i in range(inserts // threads):
+                        db.add(Transaction(user_id=user_id, amount=1 + i, description="Benchmark",
+                                           date=datetime.utcnow()))
+                        bump_data_version(db, user_id)
+                        db.commit()
+                finally:
+                    db.close()
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(write, user_ids))
+            elapsed = time.perf_counter() - started
+            print(f"{count} shard(s): {inserts / elapsed:8.0f} inserts/s")
+            router.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Memory cost of idle dashboard event streams (GET /api/events), per worker.
+
+Opens `connections` EventBroker streams that only wait for events, measures
+the Python heap they hold with tracemalloc, then closes them and checks that
+every subscription is released. Exits non-zero past the budget.
+
+    python -m benchmarks.sse_idle_memory [connections]
+"""
+import asyncio
+import gc
+import sys
+import tracemalloc
+
+from app.events import EventBroker
+
+# Generous: a stream is one Subscription, its bounded queue, the task and its
+# suspended generator, about 6 KiB all told on CPython 3.11
+BUDGET_PER_CONNECTION = 16 * 1024
+
+
+class IdleRequest:
+    """Stands in for a Starlette request whose client stays connected"""
+
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+async def _consume(stream, frames: list) -> None:
+    async for frame in stream:
+        frames.append(frame)
+
+
+async def measure(connections: int) -> int:
+    broker = EventBroker(heartbeat_interval=3600)
+    request = IdleRequest()
+    frames: list = []
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    tasks = [
+        asyncio.create_task(_consume(broker.stream(request, user_id % 50), frames))
+        for user_id in range(connections)
+    ]
+    # Let every stream subscribe and park on its empty queue
+    while len(frames) < connections:
+        await asyncio.sleep(0)
+    held = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+
+    # Wait for delivery: cancelling a stream mid-delivery can lose the cancel
+    streams_of_user = len(range(7, connections, 50))
+    broker.publish(7, "transaction", {"id": 1})
+    while len(frames) < connections + streams_of_user:
+        await asyncio.sleep(0)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.wait(tasks)
+    del tasks, frames
+    gc.collect()
+    released = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    tracemalloc.stop()
+
+    per_connection = held // connections
+    print(f"{connections} idle streams: {held / 1024:8.1f} KiB, {per_connection} bytes each")
+    print(f"event for one user reached its {streams_of_user} streams")
+    print(f"after close: {broker.connection_count()} subscribed, {released / 1024:.1f} KiB still held")
+    if broker.connection_count():
+        sys.exit("closed streams are still subscribed")
+    return per_connection
+
+
+def main(connections: int = 500) -> None:
+    per_connection = asyncio.run(measure(connections))
+    if per_connection > BUDGET_PER_CONNECTION:
+        sys.exit(f"{per_connection} bytes per idle stream is over the {BUDGET_PER_CONNECTION} byte budget")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -1,23 +1,45 @@
 import openai
+import hashlib
 from app.config import Config
+from app.cache_backend import shared_cache
+from services.llm_client import create_chat_completion
+from app.admission import llm_admission
+
+# Classifications of a given description rarely change; refresh weekly
+CLASSIFICATION_TTL = 7 * 24 * 60 * 60
 
 class CategoryClassifier:
     def __init__(self):
         openai.api_key = Config.OPENAI_API_KEY
         
-    def predict_category(self, description: str) -> tuple:
+    def predict_category(self, description: str, user_key=None) -> tuple:
+        """
+        (category, confidence) for a description. Cached classifications are
+        free; only a cache miss is admitted as an LLM call for user_key, and a
+        refused or failed call classifies as ("Other", 0.0).
+        """
+        normalized = " ".join(description.lower().split())
+        key = f"classifier:{Config.MODEL_NAME}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+        def classify():
+            with llm_admission.admit("classify", user_key):
+                return self._classify(description)
+
         try:
-            response = openai.ChatCompletion.create(
-                model=Config.MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a financial transaction classifier. Categorize the following transaction into one of these categories: 'Food', 'Transportation', 'Shopping', 'Entertainment', 'Bills', 'Other'. Return only the category name and confidence score (0-1) separated by a comma."},
-                    {"role": "user", "content": description}
-                ]
-            )
-            
-            result = response.choices[0].message.content.strip().split(',')
-            category = result[0].strip()
-            confidence = float(result[1].strip())
-            return category, confidence
+            return shared_cache.get_or_compute(key, classify, ttl=CLASSIFICATION_TTL)
         except Exception as e:
-            return "Other", 0.0
\ No newline at end of file
+            return "Other", 0.0
+
+    def _classify(self, description: str) -> tuple:
+        content = create_chat_completion(
+            model=Config.MODEL_NAME,
+            messages=[
+                {"role": "system", "content": "You are a financial transaction classifier. Categorize the following transaction into one of these categories: 'Food', 'Transportation', 'Shopping', 'Entertainment', 'Bills', 'Other'. Return only the category name and confidence score (0-1) separated by a comma."},
+                {"role": "user", "content": description}
+            ]
+        )
+        
+        result = content.split(',')
+        category = result[0].strip()
+        confidence = float(result[1].strip())
+        return category, confidence
\ No newline at end of file
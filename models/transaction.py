@@ -1,14 +1,28 @@
 from sqlalchemy import Column, Integer, Float, String, DateTime
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 from app.database import Base
+from app.utils import to_cents, from_cents
 
 class Transaction(Base):
     __tablename__ = "transactions"
     
     id = Column(Integer, primary_key=True, index=True)
-    amount = Column(Float)
+    amount_cents = Column(Integer, nullable=False, default=0)
     description = Column(String)
     category = Column(String)
     date = Column(DateTime, default=datetime.utcnow)
     predicted_category = Column(String, nullable=True)
-    confidence_score = Column(Float, nullable=True)
\ No newline at end of file
+    confidence_score = Column(Float, nullable=True)
+
+    @hybrid_property
+    def amount(self):
+        return from_cents(self.amount_cents) if self.amount_cents is not None else None
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_cents / 100.0
\ No newline at end of file
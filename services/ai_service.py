@@ -1,169 +1,249 @@
 import openai
-from typing import Dict, List, Tuple, Optional
+import json
+import hashlib
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional, Union
 from datetime import datetime, timedelta
 from app.config import Config
-from statistics import mean, stdev
+from app.columnar import TransactionColumns
+from app.cache_backend import shared_cache
+from app.admission import llm_admission
+from app.utils import to_cents, from_cents, format_cents
+from services.llm_client import create_chat_completion
+from services.spending_summary import build_insights_prompt
+from services.budget_engine import compute_budget
+
+INSIGHTS_TTL = 24 * 60 * 60
+BUDGET_REFINEMENT_TTL = 24 * 60 * 60
+BUDGET_RETRY_AFTER = 5 * 60
+
+# Background LLM budget refinements; requests only ever read their results
+_refinement_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="budget-refinement")
+_pending_refinements = set()
+_pending_lock = threading.Lock()
+
+Transactions = Union[List[Dict], TransactionColumns]
+
+def _as_columns(transactions: Transactions) -> TransactionColumns:
+    if isinstance(transactions, TransactionColumns):
+        return transactions
+    return TransactionColumns.from_dicts(transactions)
 
 class AIService:
     def __init__(self):
         openai.api_key = Config.OPENAI_API_KEY
         self.model_name = Config.MODEL_NAME
 
-    def get_spending_insights(self, transactions: List[Dict]) -> str:
+    def get_spending_insights(self, summary: Dict, user_key=None) -> str:
         """
-        Generate AI-powered insights about spending patterns
+        Generate AI-powered insights about spending patterns from an
+        aggregate summary of the full history (see summarize_spending)
         """
-        if not transactions:
+        if not summary['transaction_count']:
             return "No transactions available for analysis."
+        try:
+            return self.generate_insights(summary, user_key)
+        except Exception as e:
+            return f"Unable to generate insights at this time: {str(e)}"
 
-        # Prepare transaction data for GPT
-        transaction_text = "\n".join([
-            f"Amount: ${t['amount']}, Category: {t['predicted_category']}, " 
-            f"Description: {t['description']}"
-            for t in transactions[-10:]  # Last 10 transactions
-        ])
+    def generate_insights(self, summary: Dict, user_key=None) -> str:
+        """
+        Like get_spending_insights, but LLM failures propagate. With a
+        user_key a cache miss must be admitted for that user (Overloaded
+        otherwise); background callers pass None and rate-limit themselves.
+        """
+        summary_text = build_insights_prompt(summary)
 
-        try:
-            response = openai.ChatCompletion.create(
+        def generate():
+            if user_key is None:
+                return call()
+            with llm_admission.admit("insights", user_key):
+                return call()
+
+        def call():
+            return create_chat_completion(
                 model=self.model_name,
                 messages=[
-                    {"role": "system", "content": "You are a financial advisor. Analyze these transactions and provide useful insights about spending patterns and suggestions for improvement. Be concise and specific."},
-                    {"role": "user", "content": f"Here are the recent transactions:\n{transaction_text}"}
+                    {"role": "system", "content": "You are a financial advisor. Analyze this spending summary and provide useful insights about spending patterns and suggestions for improvement. Be concise and specific."},
+                    {"role": "user", "content": f"Here is a summary of my spending:\n{summary_text}"}
                 ]
             )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Unable to generate insights at this time: {str(e)}"
 
-    def detect_anomalies(self, transactions: List[Dict]) -> List[Dict]:
+        # Identical prompts get the same insight from every worker on the host
+        key = f"insights:{self.model_name}:{hashlib.sha1(summary_text.encode('utf-8')).hexdigest()}"
+        return shared_cache.get_or_compute(key, generate, ttl=INSIGHTS_TTL)
+
+    def detect_anomalies(self, transactions: Transactions,
+                         fences: Optional[Dict[str, Tuple[float, float, float, float]]] = None) -> List[Dict]:
         """
-        Detect unusual spending patterns or potential fraudulent transactions
+        Detect unusual spending patterns or potential fraudulent transactions.
+        With a user's sketch fences (see app.sketches.anomaly_fences) an amount
+        is unusual outside its category's fences; without them, more than two
+        standard deviations from its category's mean.
         """
-        if len(transactions) < 2:
+        columns = _as_columns(transactions)
+        if fences is not None:
+            return self._fence_anomalies(columns, fences)
+        if len(columns) < 2:
             return []
 
-        anomalies = []
-        category_averages = {}
-        category_stddev = {}
-
-        # Calculate average and standard deviation for each category
-        for transaction in transactions:
-            category = transaction['predicted_category']
-            amount = transaction['amount']
-            
-            if category not in category_averages:
-                category_averages[category] = []
-            category_averages[category].append(amount)
-
-        for category, amounts in category_averages.items():
-            if len(amounts) >= 2:
-                category_averages[category] = mean(amounts)
-                category_stddev[category] = stdev(amounts)
-            else:
-                category_averages[category] = amounts[0]
-                category_stddev[category] = 0
+        amounts = columns.amounts
+        codes = columns.predicted_codes
+
+        # Per-category mean and sample standard deviation
+        counts = np.bincount(codes)
+        means = np.bincount(codes, weights=amounts) / np.maximum(counts, 1)
+        row_means = means[codes]
+        squared_deviations = np.bincount(codes, weights=(amounts - row_means) ** 2)
+        stddevs = np.sqrt(squared_deviations / np.maximum(counts - 1, 1))
+        stddevs[counts < 2] = 0
 
         # Detect anomalies (transactions > 2 standard deviations from mean)
-        for transaction in transactions:
-            category = transaction['predicted_category']
-            amount = transaction['amount']
-            
-            if category_stddev[category] > 0:
-                z_score = abs(amount - category_averages[category]) / category_stddev[category]
-                if z_score > 2:
-                    anomalies.append({
-                        'transaction': transaction,
-                        'reason': f"Amount is unusually {'high' if amount > category_averages[category] else 'low'} for this category",
-                        'severity': 'high' if z_score > 3 else 'medium'
-                    })
+        row_stddevs = stddevs[codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.where(row_stddevs > 0, np.abs(amounts - row_means) / row_stddevs, 0)
 
-        return anomalies
+        anomalies = []
+        for i in np.flatnonzero(z_scores > 2):
+            anomalies.append({
+                'transaction': columns.row(i),
+                'reason': f"Amount is unusually {'high' if amounts[i] > row_means[i] else 'low'} for this category",
+                'severity': 'high' if z_scores[i] > 3 else 'medium'
+            })
 
-    def suggest_budget(self, transactions: List[Dict], income: float) -> Dict[str, float]:
-        """
-        Generate AI-powered budget suggestions based on spending history and income
-        """
-        # Calculate current spending by category
-        category_spending = {}
-        for transaction in transactions:
-            category = transaction['predicted_category']
-            amount = transaction['amount']
-            if category in category_spending:
-                category_spending[category] += amount
-            else:
-                category_spending[category] = amount
+        return anomalies
 
-        try:
-            # Convert spending data to text for GPT
-            spending_text = "\n".join([
-                f"{category}: ${amount:.2f}" 
-                for category, amount in category_spending.items()
-            ])
+    def _fence_anomalies(self, columns: TransactionColumns,
+                         fences: Dict[str, Tuple[float, float, float, float]]) -> List[Dict]:
+        if not len(columns) or not fences:
+            return []
 
-            response = openai.ChatCompletion.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a financial advisor. Based on the current spending patterns and income, suggest a monthly budget allocation. Return only category:amount pairs, comma-separated."},
-                    {"role": "user", "content": f"Monthly income: ${income}\nCurrent monthly spending:\n{spending_text}"}
-                ]
-            )
+        # Sketches key a row by its category, else its predicted category
+        has_category = np.array([bool(c) for c in columns.categories], dtype=bool)
+        codes = np.where(has_category[columns.category_codes], columns.category_codes, columns.predicted_codes)
+        # Per-code fences; categories without enough history never flag
+        bounds = np.array([
+            fences.get(category or 'Other', (-np.inf, -np.inf, np.inf, np.inf))
+            for category in columns.categories
+        ])[codes]
+        amount_cents = np.abs(columns.amount_cents)
 
-            # Parse GPT response into dictionary
-            budget_text = response.choices[0].message.content.strip()
-            budget_pairs = [pair.strip() for pair in budget_text.split(',')]
-            budget = {}
-            
-            for pair in budget_pairs:
-                category, amount = pair.split(':')
-                budget[category.strip()] = float(amount.strip().replace('$', ''))
+        anomalies = []
+        for i in np.flatnonzero((amount_cents < bounds[:, 1]) | (amount_cents > bounds[:, 2])):
+            high = amount_cents[i] > bounds[i, 2]
+            outer = amount_cents[i] > bounds[i, 3] if high else amount_cents[i] < bounds[i, 0]
+            anomalies.append({
+                'transaction': columns.row(i),
+                'reason': f"Amount is unusually {'high' if high else 'low'} for this category",
+                'severity': 'high' if outer else 'medium'
+            })
 
-            return budget
-        except Exception as e:
-            # Fallback to simple percentage-based budget if AI fails
-            return self._generate_simple_budget(income)
+        return anomalies
 
-    def _generate_simple_budget(self, income: float) -> Dict[str, float]:
+    def suggest_budget(self, category_spending: Dict[str, int], income: float) -> Tuple[Dict[str, float], str]:
+        """
+        Budget suggestion from monthly spend per category (in cents) and income.
+        Returns the LLM-refined budget when one is cached, otherwise the local
+        engine's budget while a refinement is fetched in the background, so
+        this never waits on the network. The second value is 'ai' or 'local'.
         """
-        Fallback method to generate a simple budget based on common guidelines
+        income_cents = to_cents(income)
+        spending_text = "\n".join([
+            f"{category}: {format_cents(cents)}"
+            for category, cents in sorted(category_spending.items())
+        ])
+        prompt = f"Monthly income: {format_cents(income_cents)}\nCurrent monthly spending:\n{spending_text}"
+        key = f"budget:{self.model_name}:{hashlib.sha1(prompt.encode('utf-8')).hexdigest()}"
+
+        refined = shared_cache.get(key)
+        if refined:
+            return {category: from_cents(cents) for category, cents in refined.items()}, 'ai'
+        if refined is None:
+            self._schedule_budget_refinement(key, prompt, income_cents)
+
+        budget = compute_budget(category_spending, income_cents)
+        return {category: from_cents(cents) for category, cents in budget.items()}, 'local'
+
+    def _schedule_budget_refinement(self, key: str, prompt: str, income_cents: int) -> None:
+        with _pending_lock:
+            if key in _pending_refinements:
+                return
+            # Skipped, not queued, while the LLM is failing or refinements
+            # are backed up; a later request schedules it again
+            if not llm_admission.try_acquire("budget"):
+                return
+            _pending_refinements.add(key)
+
+        def run():
+            try:
+                budget = self._refine_budget(prompt, income_cents)
+                shared_cache.set(key, budget, ttl=BUDGET_REFINEMENT_TTL)
+            except Exception:
+                # An empty budget marks the failure so requests stop retrying for a while
+                shared_cache.set(key, {}, ttl=BUDGET_RETRY_AFTER)
+            finally:
+                llm_admission.release("budget")
+                with _pending_lock:
+                    _pending_refinements.discard(key)
+
+        _refinement_pool.submit(run)
+
+    def _refine_budget(self, prompt: str, income_cents: int) -> Dict[str, int]:
+        """
+        Ask the LLM for a budget as a JSON object and validate it; raises
+        ValueError on anything that is not a usable budget
         """
-        return {
-            'Housing': income * 0.3,
-            'Food': income * 0.15,
-            'Transportation': income * 0.1,
-            'Utilities': income * 0.1,
-            'Entertainment': income * 0.05,
-            'Shopping': income * 0.1,
-            'Savings': income * 0.15,
-            'Other': income * 0.05
-        }
-
-    def predict_future_expenses(self, transactions: List[Dict], months_ahead: int = 1) -> Dict[str, float]:
+        content = create_chat_completion(
+            model=self.model_name,
+            messages=[
+                {"role": "system", "content": "You are a financial advisor. Based on the current spending patterns and income, suggest a monthly budget allocation. Respond with only a JSON object mapping category names to monthly amounts in dollars, e.g. {\"Food\": 400.00, \"Savings\": 500.00}."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        parsed = json.loads(content[content.find('{'):content.rfind('}') + 1])
+        if not isinstance(parsed, dict) or not parsed:
+            raise ValueError("Budget is not a JSON object")
+
+        budget = {}
+        for category, amount in parsed.items():
+            if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount < 0:
+                raise ValueError(f"Invalid amount for {category}")
+            budget[str(category).strip()] = to_cents(amount)
+        if sum(budget.values()) > income_cents:
+            raise ValueError("Budget exceeds income")
+        return budget
+
+    def predict_future_expenses(self, transactions: Transactions, months_ahead: int = 1) -> Dict[str, float]:
         """
         Predict future expenses based on historical spending patterns
         """
-        if not transactions:
+        columns = _as_columns(transactions)
+        if not len(columns):
             return {}
 
-        # Group transactions by category and calculate monthly averages
-        category_totals = {}
-        for transaction in transactions:
-            category = transaction['predicted_category']
-            amount = transaction['amount']
-            if category in category_totals:
-                category_totals[category].append(amount)
-            else:
-                category_totals[category] = [amount]
+        amounts = columns.amounts
+        codes = columns.predicted_codes
+
+        # Per-category average plus the first and last amount for the trend
+        counts = np.bincount(codes)
+        averages = np.bincount(codes, weights=amounts) / np.maximum(counts, 1)
+        present, first_index = np.unique(codes, return_index=True)
+        _, last_from_end = np.unique(codes[::-1], return_index=True)
+        last_index = len(codes) - 1 - last_from_end
 
         predictions = {}
-        for category, amounts in category_totals.items():
-            avg_monthly = mean(amounts)
+        for position in np.argsort(first_index):
+            code = present[position]
+            avg_monthly = averages[code]
             # Add simple trend analysis
-            if len(amounts) >= 2:
-                trend = (amounts[-1] - amounts[0]) / len(amounts)
+            if counts[code] >= 2:
+                trend = (amounts[last_index[position]] - amounts[first_index[position]]) / counts[code]
                 predicted_amount = avg_monthly + (trend * months_ahead)
             else:
                 predicted_amount = avg_monthly
 
-            predictions[category] = max(0, predicted_amount)  # Ensure no negative predictions
+            predictions[columns.categories[code]] = max(0, float(predicted_amount))  # Ensure no negative predictions
 
-        return predictions
\ No newline at end of file
+        return predictions
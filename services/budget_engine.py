@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.database import Transaction
+
+# Common guideline split, used when there is no spending history to go on
+GUIDELINE_SHARES = {
+    'Housing': 0.3,
+    'Food': 0.15,
+    'Transportation': 0.1,
+    'Utilities': 0.1,
+    'Entertainment': 0.05,
+    'Shopping': 0.1,
+    'Savings': 0.15,
+    'Other': 0.05
+}
+
+# Spending that is hard to cut at short notice; trimmed only after everything else
+ESSENTIAL_CATEGORIES = {'Housing', 'Bills', 'Utilities', 'Food', 'Transportation'}
+
+SAVINGS_SHARE = 0.15
+
+def average_monthly_spend(
+    db: Session,
+    user_id: Optional[int],
+    months: int = 3,
+    now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Average monthly spend per category in cents over the last `months`
+    calendar months (including the current one), aggregated in SQL
+    """
+    now = now or datetime.utcnow()
+    month_index = now.year * 12 + now.month - months
+    start = datetime(month_index // 12, month_index % 12 + 1, 1)
+    category = func.coalesce(Transaction.predicted_category, Transaction.category, 'Other')
+    query = db.query(category, func.sum(Transaction.amount_cents))\
+        .filter(Transaction.date >= start)
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return {
+        name: round(cents / months)
+        for name, cents in query.group_by(category).all()
+        if cents > 0
+    }
+
+def _scale(spend: Dict[str, int], available: int) -> Dict[str, int]:
+    total = sum(spend.values())
+    if total <= available:
+        return dict(spend)
+    return {name: cents * available // total for name, cents in spend.items()}
+
+def compute_budget(spend_cents: Dict[str, int], income_cents: int) -> Dict[str, int]:
+    """
+    Deterministic monthly budget in cents. Savings are reserved first; if
+    current spending does not fit in the rest, discretionary categories are
+    scaled down before essentials are. Whatever is left over goes to Savings,
+    so the allocations always add up to the income.
+    """
+    if income_cents <= 0:
+        return {}
+    if not spend_cents:
+        budget = {name: int(income_cents * share) for name, share in GUIDELINE_SHARES.items()}
+        budget['Savings'] += income_cents - sum(budget.values())
+        return budget
+
+    available = income_cents - int(income_cents * SAVINGS_SHARE)
+    essentials = {k: v for k, v in spend_cents.items() if k in ESSENTIAL_CATEGORIES}
+    discretionary = {k: v for k, v in spend_cents.items() if k not in ESSENTIAL_CATEGORIES}
+
+    budget = _scale(essentials, available)
+    budget.update(_scale(discretionary, available - sum(budget.values())))
+    budget['Savings'] = budget.get('Savings', 0) + income_cents - sum(budget.values())
+    return budget
@@ -0,0 +1,76 @@
+import openai
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+from app.config import Config
+from app.singleflight import SingleFlight
+from app.admission import Overloaded, llm_breaker
+
+# Identical prompts in flight at the same time share one OpenAI call
+llm_flights = SingleFlight()
+
+class RateLimiter:
+    """Spaces calls at least 1/calls_per_second apart, blocking the caller"""
+
+    def __init__(self, calls_per_second: float):
+        self.interval = 1.0 / calls_per_second
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+# Request threads are never throttled; background workers share a limiter
+_thread_limits = threading.local()
+
+def set_llm_rate_limit(limiter: Optional[RateLimiter]) -> None:
+    """Throttle OpenAI calls made by the calling thread (threads may share one limiter); None removes it"""
+    _thread_limits.limiter = limiter
+
+def normalize_prompt(model: str, messages: List[Dict[str, str]]) -> str:
+    """
+    Stable key for a chat request: case and whitespace differences do not
+    start a second call
+    """
+    parts = [model]
+    for message in messages:
+        parts.append(message['role'])
+        parts.append(" ".join(message['content'].casefold().split()))
+    return hashlib.sha1("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+def create_chat_completion(messages: List[Dict[str, str]], model: str = Config.MODEL_NAME) -> str:
+    """
+    Run a chat completion and return the stripped message content, coalescing
+    concurrent identical requests. Raises Overloaded without calling out
+    while the circuit breaker is open.
+    """
+    limiter = getattr(_thread_limits, 'limiter', None)
+
+    def call():
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            response = openai.ChatCompletion.create(
+                model=model, messages=messages, request_timeout=Config.LLM_TIMEOUT
+            )
+        except Exception:
+            llm_breaker.record_failure()
+            raise
+        llm_breaker.record_success()
+        return response.choices[0].message.content.strip()
+
+    if not llm_breaker.allow():
+        raise Overloaded("circuit_open")
+
+    return llm_flights.do(normalize_prompt(model, messages), call)
+
+def llm_metrics() -> Dict[str, int]:
+    stats = llm_flights.stats()
+    stats["calls_saved"] = stats["coalesced"]
+    return stats
@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import Float, case, cast, func
+from sqlalchemy.orm import Session
+from app.models.database import Transaction
+from app.utils import format_cents
+
+# Rough chars-per-token ratio for English prompt text; good enough to budget
+# without pulling in a tokenizer
+CHARS_PER_TOKEN = 4
+PROMPT_TOKEN_BUDGET = 350
+
+def _category():
+    return func.coalesce(Transaction.predicted_category, Transaction.category, 'Other')
+
+def _scoped(query, user_id: Optional[int]):
+    if user_id is None:
+        return query
+    return query.filter(Transaction.user_id == user_id)
+
+def _month_start(now: datetime, months_back: int) -> datetime:
+    month_index = now.year * 12 + now.month - 1 - months_back
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+def summarize_spending(
+    db: Session,
+    user_id: Optional[int],
+    months: int = 3,
+    top_merchants: int = 5,
+    max_anomalies: int = 5,
+    now: Optional[datetime] = None
+) -> Dict:
+    """
+    Aggregate a user's full history in SQL: overall and per-category totals,
+    per-month category totals for the last few calendar months, the biggest
+    merchants and amounts more than 2 standard deviations from their
+    category mean. A user_id of None covers every transaction.
+    """
+    now = now or datetime.utcnow()
+    category = _category()
+
+    count, total_cents, first_date, last_date = _scoped(db.query(
+        func.count(Transaction.id),
+        func.coalesce(func.sum(Transaction.amount_cents), 0),
+        func.min(Transaction.date),
+        func.max(Transaction.date)
+    ), user_id).one()
+
+    category_rows = _scoped(db.query(
+        category, func.count(Transaction.id), func.sum(Transaction.amount_cents)
+    ), user_id).group_by(category).order_by(func.sum(Transaction.amount_cents).desc()).all()
+
+    month = func.strftime('%Y-%m', Transaction.date)
+    monthly = {}
+    for month_key, name, cents in _scoped(db.query(
+        month, category, func.sum(Transaction.amount_cents)
+    ), user_id).filter(Transaction.date >= _month_start(now, months - 1))\
+            .group_by(month, category).all():
+        monthly.setdefault(month_key, {})[name] = cents
+
+    merchant = func.lower(func.trim(Transaction.description))
+    merchant_rows = _scoped(db.query(
+        merchant, func.count(Transaction.id), func.sum(Transaction.amount_cents)
+    ), user_id).filter(merchant != '')\
+        .group_by(merchant)\
+        .order_by(func.sum(Transaction.amount_cents).desc())\
+        .limit(top_merchants).all()
+
+    # Sample variance from count, sum and sum of squares, joined back to the rows
+    cents = cast(Transaction.amount_cents, Float)
+    stats = _scoped(db.query(
+        category.label('category'),
+        func.avg(cents).label('mean'),
+        ((func.sum(cents * cents) - func.sum(cents) * func.sum(cents) / func.count(Transaction.id))
+         / (func.count(Transaction.id) - 1)).label('variance')
+    ), user_id).group_by(category).having(func.count(Transaction.id) > 1).subquery()
+    deviation = cents - stats.c.mean
+    anomaly_rows = _scoped(db.query(
+        Transaction.date, Transaction.description, Transaction.amount_cents,
+        stats.c.category, stats.c.mean,
+        case((deviation > 0, 'high'), else_='low')
+    ).join(stats, stats.c.category == category), user_id)\
+        .filter(stats.c.variance > 0)\
+        .filter(deviation * deviation > 4 * stats.c.variance)\
+        .order_by((deviation * deviation / stats.c.variance).desc())\
+        .limit(max_anomalies).all()
+
+    return {
+        "transaction_count": count,
+        "total_cents": total_cents,
+        "first_date": first_date,
+        "last_date": last_date,
+        "categories": [
+            {"category": name, "count": n, "total_cents": cents}
+            for name, n, cents in category_rows
+        ],
+        "monthly": [
+            {"month": month_key, "categories": monthly.get(month_key, {})}
+            for month_key in (_month_start(now, i).strftime('%Y-%m') for i in reversed(range(months)))
+        ],
+        "merchants": [
+            {"merchant": name, "count": n, "total_cents": cents}
+            for name, n, cents in merchant_rows
+        ],
+        "anomalies": [
+            {
+                "date": date,
+                "description": description,
+                "amount_cents": amount_cents,
+                "category": name,
+                "mean_cents": round(mean),
+                "direction": direction
+            }
+            for date, description, amount_cents, name, mean, direction in anomaly_rows
+        ]
+    }
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _month_over_month(monthly: List[Dict]) -> List[str]:
+    if len(monthly) < 2:
+        return []
+    previous, current = monthly[-2], monthly[-1]
+    lines = []
+    for name in sorted(set(previous['categories']) | set(current['categories'])):
+        before = previous['categories'].get(name, 0)
+        after = current['categories'].get(name, 0)
+        change = f" ({(after - before) / before:+.0%})" if before else ""
+        lines.append(f"- {name}: {format_cents(before)} -> {format_cents(after)}{change}")
+    return lines
+
+def build_insights_prompt(summary: Dict, token_budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """
+    Render a spending summary as compact prompt text. Sections are added in
+    priority order and list sections are trimmed from the bottom until the
+    text fits the token budget.
+    """
+    header = [
+        f"Transactions: {summary['transaction_count']} totalling {format_cents(summary['total_cents'])}"
+        + (f", {summary['first_date']:%Y-%m-%d} to {summary['last_date']:%Y-%m-%d}"
+           if summary['first_date'] else "")
+    ]
+    monthly = summary['monthly']
+    sections = [
+        ("Spending by category (all time):", [
+            f"- {c['category']}: {format_cents(c['total_cents'])} over {c['count']}"
+            for c in summary['categories']
+        ]),
+        (f"Month over month ({monthly[-2]['month']} -> {monthly[-1]['month']} to date):"
+         if len(monthly) >= 2 else "", _month_over_month(monthly)),
+        ("Unusual transactions:", [
+            f"- {a['date']:%Y-%m-%d} {a['description']}: {format_cents(a['amount_cents'])} "
+            f"({a['direction']} for {a['category']}, typical {format_cents(a['mean_cents'])})"
+            for a in summary['anomalies']
+        ]),
+        ("Top merchants:", [
+            f"- {m['merchant']}: {format_cents(m['total_cents'])} over {m['count']}"
+            for m in summary['merchants']
+        ]),
+    ]
+
+    lines = list(header)
+    for title, items in sections:
+        if not items:
+            continue
+        kept = []
+        for item in items:
+            candidate = "\n".join(lines + [title] + kept + [item])
+            if estimate_tokens(candidate) > token_budget:
+                break
+            kept.append(item)
+        if kept:
+            lines.extend([title] + kept)
+    return "\n".join(lines)
@@ -1,39 +1,42 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
 from models.transaction import Transaction
 from models.category_classifier import CategoryClassifier
+from app.group_commit import writer_for_user
 
 class TransactionService:
     def __init__(self, db: Session):
         self.db = db
         self.classifier = CategoryClassifier()
     
-    def create_transaction(self, amount: float, description: str) -> Transaction:
-        predicted_category, confidence = self.classifier.predict_category(description)
-        
-        transaction = Transaction(
-            amount=amount,
-            description=description,
-            predicted_category=predicted_category,
-            confidence_score=confidence
+    async def create_transaction(self, amount: float, description: str, user_id=None, user_key=None):
+        """
+        Classify and insert through the user's group-commit writer, so the
+        row gets the same series, sketch, version and cache updates as any
+        other insert. Without a user the row is unscoped.
+        """
+        # The classifier may call the LLM; keep it off the event loop
+        predicted_category, confidence = await run_in_threadpool(
+            self.classifier.predict_category, description, user_key
         )
         
-        self.db.add(transaction)
-        self.db.commit()
-        self.db.refresh(transaction)
+        transaction, _ = await writer_for_user(user_id).insert({
+            "user_id": user_id,
+            "amount": amount,
+            "description": description,
+            "predicted_category": predicted_category,
+            "confidence_score": confidence
+        })
         return transaction
     
     def get_transactions(self, skip: int = 0, limit: int = 100):
         return self.db.query(Transaction).offset(skip).limit(limit).all()
     
     def get_spending_analysis(self):
-        transactions = self.db.query(Transaction).all()
-        categories = {}
-        
-        for transaction in transactions:
-            category = transaction.predicted_category
-            if category in categories:
-                categories[category] += transaction.amount
-            else:
-                categories[category] = transaction.amount
-                
-        return categories
\ No newline at end of file
+        """Category totals in integer cents"""
+        return dict(
+            self.db.query(Transaction.predicted_category, func.sum(Transaction.amount_cents))
+            .group_by(Transaction.predicted_category)
+            .all()
+        )
\ No newline at end of file